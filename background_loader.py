@@ -0,0 +1,130 @@
+"""Background loading of workbook batches for the bank windows.
+
+Parsing a big workbook on the Tk thread freezes the window. BackgroundLoader
+consumes a batch generator on a worker thread and hands every batch back to the
+Tk thread through a small queue polled with after(), so the window keeps
+redrawing and the user can cancel. LoadingBar is the progress bar, row counter
+and Cancel button shown while a load runs.
+"""
+from queue import Queue, Empty, Full
+from threading import Thread, Event
+from tkinter import Frame, Label, Button, TclError
+from tkinter import ttk
+
+POLL_MS = 50
+# Batches waiting for the Tk thread, keeps memory bounded when the UI falls behind
+QUEUE_SIZE = 4
+
+
+class BackgroundLoader:
+    """Runs batches (a generator) on a worker thread.
+
+    on_batch(batch) is called on the Tk thread for every batch, on_progress(rows,
+    fraction) after each of them, then on_done() or on_error(exception).
+    progress() is evaluated on the worker thread after each batch and returns
+    (rows loaded, fraction done or None when unknown).
+    """
+
+    def __init__(self, widget, batches, on_batch, on_done, on_error, progress=None, on_progress=None):
+        self.widget = widget
+        self.batches = batches
+        self.on_batch = on_batch
+        self.on_done = on_done
+        self.on_error = on_error
+        self.progress = progress
+        self.on_progress = on_progress
+
+        self.queue = Queue(maxsize=QUEUE_SIZE)
+        self.cancelled = Event()
+        self.thread = Thread(target=self.work, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        self.widget.after(POLL_MS, self.poll)
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def put(self, message):
+        # Give up when cancelled instead of blocking on a queue nobody reads anymore
+        while not self.cancelled.is_set():
+            try:
+                self.queue.put(message, timeout=0.1)
+                return True
+            except Full:
+                continue
+        return False
+
+    def work(self):
+        try:
+            for batch in self.batches:
+                if self.cancelled.is_set():
+                    return
+                progress = self.progress() if self.progress else None
+                if not self.put(("batch", (batch, progress))):
+                    return
+            self.put(("done", None))
+        except Exception as e:
+            self.put(("error", e))
+        finally:
+            self.batches.close()
+
+    def poll(self):
+        if self.cancelled.is_set():
+            return
+
+        finished = False
+        try:
+            # Apply at most a couple of batches per tick so the window stays responsive
+            for _ in range(2):
+                kind, payload = self.queue.get_nowait()
+                if kind == "batch":
+                    batch, progress = payload
+                    self.on_batch(batch)
+                    if progress and self.on_progress:
+                        self.on_progress(*progress)
+                elif kind == "done":
+                    finished = True
+                    self.on_done()
+                    break
+                else:
+                    finished = True
+                    self.on_error(payload)
+                    break
+        except Empty:
+            pass
+
+        if not finished:
+            try:
+                self.widget.after(POLL_MS, self.poll)
+            except TclError:
+                # The window was closed while loading
+                self.cancel()
+
+
+class LoadingBar(Frame):
+    """Progress bar, row counter and Cancel button."""
+
+    def __init__(self, master, on_cancel):
+        super().__init__(master)
+        self.progress_bar = ttk.Progressbar(self, mode="indeterminate", maximum=100)
+        self.progress_bar.pack(side="left", fill="x", expand=True, padx=5)
+
+        self.rows_label = Label(self, text="Loading...", width=22, anchor="w")
+        self.rows_label.pack(side="left", padx=5)
+
+        self.cancel_button = Button(self, text="Cancel", command=on_cancel)
+        self.cancel_button.pack(side="left", padx=5)
+
+    def start(self):
+        self.progress_bar.config(mode="indeterminate", value=0)
+        self.progress_bar.start(15)
+
+    def update_progress(self, rows, fraction=None):
+        self.rows_label.config(text=f"Loaded {rows:,} rows")
+        if fraction is not None:
+            self.progress_bar.stop()
+            self.progress_bar.config(mode="determinate", value=min(100, fraction * 100))
+
+    def stop(self):
+        self.progress_bar.stop()
@@ -0,0 +1,379 @@
+"""The window of a bank: invoice fields, the customer table and Create Invoice.
+
+Every bank module (adib_module, dib_module, ...) subclasses BankWindow and only
+sets its table columns; the formats and calculations are in banks.py.
+"""
+from datetime import datetime
+from os import path
+from re import sub
+from tkinter import filedialog, messagebox, ttk, Label, Frame, Entry
+from tkinter import TclError, END, Button
+from background_loader import BackgroundLoader, LoadingBar
+from banks import BANKS
+from ingestion import last_load, load_progress
+from invoice import InvoiceJob
+from invoice_counter import reserve, use, release, number_state, format_number, parse_number, USED
+from profiler import PROFILE_KEY, start_capture
+from row_model import TEXT_COLUMN, MONEY_COLUMN
+from timings import start_run
+from virtual_table import VirtualTable
+
+
+class BankWindow:
+    """Window of one bank: the invoice fields, the customer table loaded from the
+    workbook in the background, and Create Invoice.
+
+    Every bank module subclasses it as InvoiceAutomation. BANK: key in BANKS;
+    HEADINGS: the table columns; CALCULATED: indices of the columns that are
+    calculated, not edited; CENTERED: headings whose cells are centered.
+    """
+
+    BANK = None
+    GEOMETRY = "800x600"
+    HEADINGS = ()
+    CALCULATED = ()
+    CALCULATED_INFO = "The Incentive field is automatically calculated and is not editable."
+    CENTERED = ()
+
+    def __init__(self, parent_window, excel_file_path, main_app_root):
+        # Workbook columns, calculations and invoice table of the bank, see above
+        self.bank = BANKS[self.BANK]
+        self.root = parent_window
+        self.main_app_root = main_app_root
+        self.root.title(f"Invoice Automation - {self.BANK}")
+        self.root.geometry(self.GEOMETRY)
+
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        # Hidden: Ctrl+Shift+P profiles the next invoice, see profiler.py
+        self.profile_next_invoice = False
+        self.root.bind(PROFILE_KEY, self.profile_next)
+
+        self.excel_file_path = excel_file_path
+
+        # UI Elements
+        main_frame = Frame(self.root)
+        main_frame.pack(fill="both", expand=True, padx=10, pady=10)
+
+        # --- Input Fields ---
+        input_frame = Frame(main_frame)
+        input_frame.pack(fill="x", pady=5)
+
+        self.invoice_date = datetime.today().strftime('%d/%m/%Y')
+        year = self.invoice_date.split("/")[-1]
+
+        self.invoice_number_label = Label(input_frame, text="Invoice Number:", anchor="e")
+        self.invoice_number_label.grid(row=0, column=0, padx=5, pady=2, sticky="ew")
+        self.invoice_number_entry = Entry(input_frame)
+        # Reserved for this window and given back if no invoice is saved with it, see invoice_counter.py
+        self.invoice_number = reserve()[0]
+        self.root.bind("<Destroy>", self.on_destroy, add="+")
+        self.invoice_number_entry.insert(END, format_number(self.invoice_number, year))
+        self.invoice_number_entry.grid(row=0, column=1, padx=5, pady=2, sticky="ew")
+
+        self.invoice_date_label = Label(input_frame, text="Invoice Date:", anchor="e")
+        self.invoice_date_label.grid(row=1, column=0, padx=5, pady=2, sticky="ew")
+        self.invoice_date_entry = Entry(input_frame)
+        self.invoice_date_entry.insert(END, self.invoice_date)
+        self.invoice_date_entry.grid(row=1, column=1, padx=5, pady=2, sticky="ew")
+
+        self.month_year_label = Label(input_frame, text="Month Year:", anchor="e")
+        self.month_year_label.grid(row=2, column=0, padx=5, pady=2, sticky="ew")
+        self.month_year_entry = Entry(input_frame)
+        self.month_year_entry.grid(row=2, column=1, padx=5, pady=2, sticky="ew")
+
+        input_frame.columnconfigure(1, weight=1)
+
+        # --- Data Display Table (Treeview) ---
+        table_frame = Frame(main_frame)
+        table_frame.pack(fill="both", expand=True, pady=10)
+
+        # Only the rows in view are materialized as Treeview items, the data lives in self.rows
+        self.rows = self.bank.new_rows()
+        self.table = VirtualTable(table_frame, self.HEADINGS, self.rows)
+        self.table.pack(fill="both", expand=True)
+        self.tree = self.table.tree
+        for heading in self.CENTERED:
+            self.tree.column(heading, anchor="center")
+
+        # Make the table cells editable on double-click
+        self.tree.bind('<Double-1>', self.on_double_click)
+
+        # --- Note below the table ---
+        note_label = Label(main_frame,
+                              text="Note: The 'Disbursal Date' will be set to the 'Month Year' entered above when creating the invoice.",
+                              font=('Arial', 9, 'italic'),
+                              fg='gray')
+        note_label.pack(pady=(5, 0))
+
+        # --- Buttons ---
+        self.button_frame = Frame(main_frame)
+        self.button_frame.pack(fill="x", pady=5)
+
+        self.create_button = Button(self.button_frame, text="Create Invoice", command=self.create_invoice)
+        self.create_button.pack(side="left", padx=5, expand=True)
+
+        # Shown above the buttons while the workbook loads in the background
+        self.loading_bar = LoadingBar(main_frame, on_cancel=self.cancel_loading)
+
+        # Load data into the Treeview
+        self.load_data_from_excel()
+
+    def use_invoice_number(self):
+        typed = parse_number(self.invoice_number_entry.get())
+        # Saved under a number typed by hand, the reserved one goes back to the counter
+        if typed != self.invoice_number:
+            self.release_invoice_number()
+        if typed is not None:
+            use([typed])
+        self.invoice_number = None
+
+    def invoice_number_conflict(self):
+        """Why the typed invoice number should not go on a new invoice, None when it is free."""
+        typed = parse_number(self.invoice_number_entry.get())
+        if typed is None or typed == self.invoice_number:
+            return None
+        state = number_state(typed)
+        if state is None:
+            return None
+        if state[0] == USED:
+            return f"Invoice number {typed} was already used on an invoice."
+        return f"Invoice number {typed} is reserved by another window or batch ({state[1]})."
+
+    def release_invoice_number(self):
+        if self.invoice_number is not None:
+            release([self.invoice_number])
+            self.invoice_number = None
+
+    def on_destroy(self, event):
+        # However the window goes away, an unused reservation is given back
+        if event.widget is self.root:
+            self.release_invoice_number()
+            # A profiled load that no invoice was saved with goes next to the workbook
+            self.load_capture.write(self.excel_file_path)
+
+    def profile_next(self, event=None):
+        self.profile_next_invoice = True
+        print("The next invoice will be profiled, the stats are saved next to its PDF")
+
+    def read_batches(self):
+        """Runs on the loader thread: cleaned batches with their calculated columns."""
+        return self.bank.read_batches(self.excel_file_path, self.load_timings)
+
+    def load_data_from_excel(self):
+        """Starts loading customer data from the selected Excel file on a background thread."""
+        # Clear existing data
+        self.rows.clear()
+        self.table.refresh()
+
+        # cProfile and tracemalloc of the read when INVOICE_PROFILE is set, see profiler.py
+        self.load_capture = start_capture("load")
+        # Per-stage timings when INVOICE_TIMINGS is set, see timings.py
+        self.load_timings = start_run("load", bank=self.bank.BANK, workbook=path.basename(self.excel_file_path))
+
+        self.create_button.config(state="disabled")
+        self.loading_bar.pack(fill="x", pady=5, before=self.button_frame)
+        self.loading_bar.start()
+
+        self.loader = BackgroundLoader(
+            self.root, self.load_capture.batches(self.read_batches()),
+            on_batch=self.add_batch, on_done=self.on_load_done, on_error=self.on_load_error,
+            progress=load_progress, on_progress=self.loading_bar.update_progress
+        )
+        self.loader.start()
+
+    def add_batch(self, batch):
+        with self.load_timings.stage("table", rows=len(batch)):
+            self.rows.extend(*self.bank.row_values(batch))
+            self.table.refresh()
+
+    def on_load_done(self):
+        self.load_capture.stop()
+        self.loading_bar.stop()
+        self.loading_bar.pack_forget()
+        self.create_button.config(state="normal")
+
+        if not len(self.rows):
+            self.on_load_error(ValueError("Header must be included in Excel file."))
+            return
+
+        self.load_timings.add_load()
+        self.load_timings.finish(rows=len(self.rows))
+        print(f"Read {last_load['rows']} rows using {last_load['backend']} in {last_load['read_seconds']:.2f}s\n")
+
+    def cancel_loading(self):
+        # Stop the loader thread and go back to the bank selection
+        self.loader.cancel()
+        self.load_capture.stop()
+        self.load_timings.finish(status="cancelled")
+        self.root.destroy()
+        self.main_app_root.deiconify()
+
+    def on_load_error(self, error):
+        self.load_capture.stop()
+        self.load_timings.finish(status="failed", error=f"{type(error).__name__}: {error}")
+        self.loading_bar.stop()
+        self.loading_bar.pack_forget()
+        # The window stays usable after the errors that do not close it, Create Invoice reports the missing data
+        self.create_button.config(state="normal")
+        try:
+            raise error
+
+        except FileNotFoundError:
+            messagebox.showerror("Error", f"Excel file not found at: {self.excel_file_path}")
+
+        except IndexError:
+            messagebox.showerror("Error", "Excel file does not contain the required columns.\nVerify correct File / Format(.xlsx) and it's columns.")
+            self.root.destroy()
+            self.main_app_root.destroy()
+
+        except ValueError as e:
+            messagebox.showerror("Error", f"Verify Correct File / Format(.xlsx) and it's columns.\nError: {e}")
+            self.root.destroy()
+            self.main_app_root.destroy()
+
+        except TclError as e:
+            messagebox.showerror("Error", f"Failed to load Excel data.\nVerify Correct File / Format(.xlsx) and it's columns.\nError: {e}")
+            self.root.destroy()
+            self.main_app_root.destroy()
+
+        except Exception as e:
+            messagebox.showerror("Error", f"Unknown Error: {e}.\nContact the developer (Aryan).")
+
+    def on_double_click(self, event):
+        # Handles double-click events to make a cell editable
+        region = self.tree.identify("region", event.x, event.y)
+        if region != "cell":
+            return
+
+        column = self.tree.identify_column(event.x)
+        column_index = int(column[1:]) - 1 # Get 0-indexed column number
+
+        # Calculated columns (the Incentive...) are not editable
+        if column_index in self.CALCULATED:
+            messagebox.showinfo("Info", self.CALCULATED_INFO)
+            return
+
+        item_id = self.tree.identify_row(event.y)
+        if not item_id:
+            return
+
+        index = int(item_id)
+        kind, name = self.rows.column(column_index)
+        cell_value = self.rows.display_row(index)[column_index]
+
+        # Create a temporary entry widget for editing
+        x, y, width, height = self.tree.bbox(item_id, column)
+        entry_edit = ttk.Entry(self.tree, justify='center')
+        entry_edit.place(x=x, y=y, width=width, height=height)
+        entry_edit.insert(0, cell_value)
+        entry_edit.focus()
+
+        def save_edit(event):
+            new_value = entry_edit.get()
+
+            if kind == TEXT_COLUMN:
+                self.rows.set_text(name, index, new_value)
+            else:
+                # Loan Amount or Payment Slab changed, recalculate the calculated columns
+                try:
+                    number = float(sub(r'[^\d.]', '', new_value))
+                except ValueError:
+                    messagebox.showerror("Invalid Input", "Loan Amount and Payment Slab must be numbers.")
+                    return
+
+                if kind == MONEY_COLUMN:
+                    self.rows.set_amount(name, index, number)
+                else:
+                    self.rows.set_slab(index, number)
+
+                self.bank.recalculate(self.rows, index)
+
+            # Update the Treeview with the new values
+            self.table.refresh_row(index)
+            entry_edit.destroy()
+
+        entry_edit.bind("<Return>", save_edit)
+        entry_edit.bind("<FocusOut>", save_edit)
+
+    def run(self):
+        self.root.mainloop()
+
+    def on_close(self):
+        self.root.destroy()
+        self.main_app_root.destroy()
+
+    def create_invoice(self):
+        # Check if invoice number is empty
+        if not self.invoice_number_entry.get():
+            messagebox.showerror("Missing Information", "Please enter the Invoice Number.")
+            return
+
+        # Check if month/year is empty
+        if not self.month_year_entry.get():
+            messagebox.showerror("Missing Information", "Please enter the Month Year.")
+            return
+
+        if not len(self.rows):
+            messagebox.showerror("Error", "No Excel data loaded. Please select a valid file.")
+            return
+
+        # A number typed by hand may already be on another invoice
+        conflict = self.invoice_number_conflict()
+        if conflict and not messagebox.askyesno("Invoice Number", f"{conflict}\nCreate the invoice with it anyway?"):
+            return
+
+        self.root.withdraw()  # Hide the current window
+
+        # Profiled after Ctrl+Shift+P or when INVOICE_PROFILE is set, see profiler.py
+        capture = start_capture("invoice", self.profile_next_invoice)
+        self.profile_next_invoice = False
+        # Per-stage timings when INVOICE_TIMINGS is set, see timings.py
+        timings = start_run("invoice", bank=self.bank.BANK, invoice_no=self.invoice_number_entry.get(), rows=len(self.rows))
+        try:
+            # Template, placeholders and totals are prepared as on the command line, see invoice.py
+            with capture.profiled():
+                job = InvoiceJob(self.bank, self.rows, self.invoice_number_entry.get(),
+                                 self.invoice_date_entry.get(), self.month_year_entry.get(), timings=timings)
+        except ValueError as e:
+            capture.stop()
+            timings.finish(status="failed", error=str(e))
+            messagebox.showerror("Error", str(e))
+            return
+
+        try:
+            with timings.stage("save dialog"):
+                save_path = filedialog.asksaveasfilename(defaultextension=".pdf", filetypes=[("PDF Documents", "*.pdf")])
+            if save_path:
+                with capture.finishing(save_path):
+                    cached = job.write(save_path)
+                self.load_capture.write(save_path)
+                timings.finish(cached=cached)
+                if cached:
+                    # The same invoice was rendered before, nothing to build
+                    print("Invoice copied from the PDF cache")
+                print("\nINVOICE HAS BEEN GENERATED !")
+
+                # MARK THE INVOICE NUMBER AS USED (invoice_counter.py)
+                self.use_invoice_number()
+                messagebox.showinfo("Success", "Invoice created and saved successfully!")
+            else:
+                capture.stop()
+                timings.finish(status="cancelled")
+
+            try:
+                self.root.destroy()
+                self.main_app_root.destroy()
+            except TclError:
+                # THE WINDOW HAS ALREADY BEEN DESTROYED
+                pass
+
+            # IGNORE ANY OTHER EXCEPTION
+            except Exception:
+                pass
+        except PermissionError as e:
+            timings.finish(status="failed", error=str(e))
+            messagebox.showerror("Error", "Permission denied. Please close the file and try again.")
+        except RuntimeError as e:
+            timings.finish(status="failed", error=str(e))
+            # The PDF renderer is missing or failed
+            messagebox.showerror("Error", str(e))
@@ -0,0 +1,327 @@
+"""Bank formats and invoice calculations.
+
+The bank windows (bank_window.py) and the headless command line (invoice.py)
+share these: the workbook columns a bank needs, its calculated columns, the
+layout of the invoice table and the totals filled into its template. Nothing
+here imports Tk, so the command line runs on hosts without it.
+"""
+from docx.enum.text import WD_ALIGN_PARAGRAPH
+from num2words import num2words
+from ingestion import iter_batches, resource_path, TEXT, NAME, NUMBER, NUMBER_OR_ZERO
+from row_model import InvoiceRows, TEXT_COLUMN, MONEY_COLUMN, SLAB_COLUMN, format_cents
+from money import to_cents, to_slabs, percent_of, scale, vat
+from timings import NO_TIMINGS
+
+# Shown in the date column until the invoice month replaces it
+DISBURSAL_DATE = "(Month Year as stated above)"
+
+FULL_MONTHS = {
+    "jan": "january",
+    "feb": "february",
+    "mar": "march",
+    "apr": "april",
+    "may": "may",
+    "jun": "june",
+    "jul": "july",
+    "aug": "august",
+    "sep": "september",
+    "oct": "october",
+    "nov": "november",
+    "dec": "december",
+}
+SHORT_MONTHS = {full: short for short, full in FULL_MONTHS.items()}
+
+
+def number_to_words(cents):
+    """An amount in integer cents in words, 330750 -> 'Three Thousand, Three Hundred Seven and Fifty Fills Only'."""
+    try:
+        # Dirhams and fils straight from the cents, 3307.5 would read 'Five Fills'
+        dirhams, fils = divmod(abs(int(cents)), 100)
+
+        # Convert integer part
+        wordsFirst = ''.join(num2words(dirhams).split(" and"))
+        wordsSecond = num2words(fils)
+
+        sign = "Minus " if cents < 0 else ""
+        return sign + f"{wordsFirst}".title() + " and " + f"{wordsSecond} Fills Only".title()
+
+    except Exception as e:
+        return f"Error: {e}"
+
+
+def convert_to_full(month_year, september="sep"):
+    """'jan 2026' -> ('jan 2026', 'january 2026'); also accepts 'jan2026' and full month names.
+
+    september is the short form of September used by the bank ('sep' or 'sept').
+    """
+    if " " in month_year:
+        month_year = month_year.split(" ")
+        month = month_year[0]
+        year = month_year[1]
+
+    else:
+        month = ""
+        year = ""
+
+        for i in month_year:
+            if i.isalpha():
+                month += i
+            elif i.isnumeric():
+                year += i
+
+    full_months = dict(FULL_MONTHS)
+    short_months = dict(SHORT_MONTHS)
+    if september != "sep":
+        full_months[september] = full_months.pop("sep")
+        short_months["september"] = september
+
+    full_month_year = full_months.get(month, month) + ((" " + year) if year else year)
+    half_month_year = short_months.get(month, month) + ((" " + year) if year else year)
+
+    return (half_month_year, full_month_year)
+
+
+class Bank:
+    """Format of one bank's workbooks and invoices.
+
+    COLUMNS: workbook columns and their ingestion kinds; ROW_LAYOUT: the invoice
+    table as (kind, name) pairs for InvoiceRows; TABLE_ALIGNMENTS: paragraph
+    alignment of each table column (None keeps the default, left).
+    """
+
+    BANK = None
+    TEMPLATE = None
+    COLUMNS = {}
+    ROW_LAYOUT = ()
+    TABLE_ALIGNMENTS = ()
+    SLAB_FORMAT = "{:g}%"
+    SEPTEMBER = "sep"
+
+    def template_path(self):
+        return resource_path(self.TEMPLATE)
+
+    def new_rows(self):
+        return InvoiceRows(self.ROW_LAYOUT, slab_format=self.SLAB_FORMAT)
+
+    def read_batches(self, excel_file_path, timings=NO_TIMINGS):
+        """Cleaned batches of the workbook with their calculated columns."""
+        # Clean the required columns batch by batch while the workbook is streamed
+        for batch in iter_batches(excel_file_path, self.COLUMNS, bank=self.BANK):
+            with timings.stage("calculate", rows=len(batch)):
+                batch = self.calculate(batch)
+            yield batch
+
+    def calculate(self, batch):
+        """Adds the calculated columns to a cleaned batch (whole columns at once, in cents, see money.py)."""
+        raise NotImplementedError
+
+    def row_values(self, batch):
+        """(texts, cents, slabs) of a calculated batch, the arguments of InvoiceRows.extend()."""
+        raise NotImplementedError
+
+    def recalculate(self, rows, index):
+        """Updates the calculated amounts of a row after its loan amount or slab was edited."""
+        incentive = percent_of(rows.amount("loan amount", index), rows.slab_units(index))
+        rows.set_cents("incentive", index, incentive)
+
+    def header(self, invoice_no, invoice_date, month_year):
+        """Placeholders of the invoice header."""
+        half_month_year, full_month_year = convert_to_full(month_year.lower(), self.SEPTEMBER)
+        return {
+            "[date today]": invoice_date,
+            "[invoice no]": invoice_no,
+            "[FullMonth year]": full_month_year.title(),
+            "[month year]": half_month_year.title(),
+        }
+
+    def totals(self, rows):
+        """Placeholders of the totals, straight from the model (integer cents)."""
+        totalLoanAmount = rows.total("loan amount")
+        totalIncentive = rows.total("incentive")
+
+        # VAT rounded to the cent once, so that the invoice adds up
+        fivePercent = int(vat(totalIncentive))
+        vatIncentive = totalIncentive + fivePercent
+        return {
+            "[five percent]": format_cents(fivePercent),
+            "[total loan]": format_cents(totalLoanAmount),
+            "[total incent]": format_cents(totalIncentive),
+            "[VAT&incent]": format_cents(vatIncentive),
+            "[AmtinWords]": f"{number_to_words(vatIncentive)}"
+        }
+
+
+class ADIB(Bank):
+    BANK = "ADIB"
+    TEMPLATE = "ADIBtemplate.docx"
+    COLUMNS = {
+        'customer name': NAME,
+        'contract amt': NUMBER,
+    }
+    ROW_LAYOUT = (
+        (TEXT_COLUMN, "disbursal date"), (TEXT_COLUMN, "type"), (TEXT_COLUMN, "customer name"),
+        (MONEY_COLUMN, "loan amount"), (SLAB_COLUMN, "payment slab"), (MONEY_COLUMN, "incentive"),
+    )
+    TABLE_ALIGNMENTS = (
+        None, WD_ALIGN_PARAGRAPH.CENTER, None,
+        WD_ALIGN_PARAGRAPH.RIGHT, WD_ALIGN_PARAGRAPH.CENTER, WD_ALIGN_PARAGRAPH.RIGHT,
+    )
+    PAYMENT_SLAB = 0.9
+
+    def calculate(self, batch):
+        batch['disbursal date'] = DISBURSAL_DATE
+        batch['payment slab'] = to_slabs(self.PAYMENT_SLAB)
+        batch['loan cents'] = to_cents(batch['contract amt'])
+        batch['incentive'] = percent_of(batch['loan cents'], batch['payment slab'])
+        return batch
+
+    def row_values(self, batch):
+        return (
+            {"disbursal date": batch['disbursal date'], "type": "New", "customer name": batch['customer name']},
+            {"loan amount": batch['loan cents'], "incentive": batch['incentive']},
+            batch['payment slab']
+        )
+
+
+class DIB(Bank):
+    BANK = "DIB"
+    TEMPLATE = "DIBtemplate.docx"
+    COLUMNS = {
+        'app id': TEXT,
+        'customer name': NAME,
+        'financial amount': NUMBER_OR_ZERO,
+        'rate': NUMBER,
+    }
+    ROW_LAYOUT = (
+        (TEXT_COLUMN, "disbursal date"), (TEXT_COLUMN, "app id"), (TEXT_COLUMN, "customer name"),
+        (MONEY_COLUMN, "loan amount"), (SLAB_COLUMN, "payment slab"), (MONEY_COLUMN, "payout"),
+        (MONEY_COLUMN, "vat"), (MONEY_COLUMN, "incentive"),
+    )
+    TABLE_ALIGNMENTS = (
+        None, WD_ALIGN_PARAGRAPH.CENTER, None,
+        WD_ALIGN_PARAGRAPH.CENTER, WD_ALIGN_PARAGRAPH.CENTER, WD_ALIGN_PARAGRAPH.CENTER,
+        WD_ALIGN_PARAGRAPH.CENTER, WD_ALIGN_PARAGRAPH.CENTER,
+    )
+    SLAB_FORMAT = "{:.2f}%"
+    SEPTEMBER = "sept"
+
+    def calculate(self, batch):
+        batch['disbursal date'] = DISBURSAL_DATE
+        # The rate is a fraction, 0.0125 is a 1.25% slab
+        batch['payment slab'] = to_slabs(batch['rate'] * 100)
+        batch['loan cents'] = to_cents(batch['financial amount'])
+        # The incentive includes the VAT: payout is incentive / 1.05 and VAT incentive / 21
+        batch['incentive'] = percent_of(batch['loan cents'], batch['payment slab'])
+        batch['payout'] = scale(batch['incentive'], 100, 105)
+        batch['vat'] = scale(batch['incentive'], 1, 21)
+        return batch
+
+    def row_values(self, batch):
+        return (
+            {"disbursal date": batch['disbursal date'], "app id": batch['app id'], "customer name": batch['customer name']},
+            {"loan amount": batch['loan cents'], "payout": batch['payout'], "vat": batch['vat'], "incentive": batch['incentive']},
+            batch['payment slab']
+        )
+
+    def recalculate(self, rows, index):
+        payout_calculated = int(percent_of(rows.amount("loan amount", index), rows.slab_units(index)))
+        vat_calculated = int(vat(payout_calculated))
+        incentive_calculated = payout_calculated + vat_calculated
+
+        rows.set_cents("payout", index, payout_calculated)
+        rows.set_cents("vat", index, vat_calculated)
+        rows.set_cents("incentive", index, incentive_calculated)
+
+    def totals(self, rows):
+        totalIncentive = rows.total("incentive")
+
+        return {
+            "[total loan]": format_cents(rows.total("loan amount")),
+            "[total payout]": format_cents(rows.total("payout")),
+            "[total vat]": format_cents(rows.total("vat")),
+            "[VAT&incent]": format_cents(totalIncentive),
+            "[AmtinWords]": f"{number_to_words(totalIncentive)}"
+        }
+
+
+class CBD(Bank):
+    BANK = "CBD"
+    TEMPLATE = "CBDtemplate.docx"
+    COLUMNS = {
+        'customer name': NAME,
+        'booked': NUMBER,
+        'lmf': TEXT,
+    }
+    ROW_LAYOUT = (
+        (TEXT_COLUMN, "disbursal date"), (TEXT_COLUMN, "lmf"), (TEXT_COLUMN, "customer name"),
+        (MONEY_COLUMN, "loan amount"), (SLAB_COLUMN, "payment slab"), (MONEY_COLUMN, "incentive"),
+    )
+    TABLE_ALIGNMENTS = ADIB.TABLE_ALIGNMENTS
+    PAYMENT_SLAB = 1
+
+    def calculate(self, batch):
+        batch['disbursal date'] = DISBURSAL_DATE
+        batch['payment slab'] = to_slabs(self.PAYMENT_SLAB)
+        batch['loan cents'] = to_cents(batch['booked'])
+        batch['incentive'] = percent_of(batch['loan cents'], batch['payment slab'])
+        return batch
+
+    def row_values(self, batch):
+        return (
+            {"disbursal date": batch['disbursal date'], "lmf": batch['lmf'], "customer name": batch['customer name']},
+            {"loan amount": batch['loan cents'], "incentive": batch['incentive']},
+            batch['payment slab']
+        )
+
+
+class Mashreq(Bank):
+    BANK = "MASHREQ"
+    TEMPLATE = "Mashreqtemplate.docx"
+    COLUMNS = {
+        'edms no': TEXT,
+        'disbursal type': TEXT,
+        'customer name': NAME,
+        'loan amount': NUMBER,
+    }
+    ROW_LAYOUT = (
+        (TEXT_COLUMN, "disbursal date"), (TEXT_COLUMN, "edms no"), (TEXT_COLUMN, "disbursal type"),
+        (TEXT_COLUMN, "customer name"), (MONEY_COLUMN, "loan amount"), (SLAB_COLUMN, "payment slab"),
+        (MONEY_COLUMN, "incentive"),
+    )
+    TABLE_ALIGNMENTS = (
+        None, WD_ALIGN_PARAGRAPH.CENTER, WD_ALIGN_PARAGRAPH.CENTER, None,
+        WD_ALIGN_PARAGRAPH.RIGHT, WD_ALIGN_PARAGRAPH.CENTER, WD_ALIGN_PARAGRAPH.RIGHT,
+    )
+    SLAB_FORMAT = "{:.2f}%"
+    PAYMENT_SLAB = 1
+
+    def calculate(self, batch):
+        batch['disbursal date'] = DISBURSAL_DATE
+        batch['payment slab'] = to_slabs(self.PAYMENT_SLAB)
+        batch['loan cents'] = to_cents(batch['loan amount'])
+        batch['incentive'] = percent_of(batch['loan cents'], batch['payment slab'])
+        return batch
+
+    def row_values(self, batch):
+        return (
+            {"disbursal date": batch['disbursal date'], "edms no": batch['edms no'],
+             "disbursal type": batch['disbursal type'], "customer name": batch['customer name']},
+            {"loan amount": batch['loan cents'], "incentive": batch['incentive']},
+            batch['payment slab']
+        )
+
+
+BANKS = {bank.BANK: bank for bank in (ADIB(), DIB(), CBD(), Mashreq())}
+
+
+def load_rows(bank, excel_file_path, timings=NO_TIMINGS):
+    """Reads a whole workbook into the bank's InvoiceRows."""
+    rows = bank.new_rows()
+    for batch in bank.read_batches(excel_file_path, timings):
+        with timings.stage("model", rows=len(batch)):
+            rows.extend(*bank.row_values(batch))
+    timings.add_load()
+
+    if not len(rows):
+        raise ValueError("Header must be included in Excel file.")
+    return rows
@@ -0,0 +1,521 @@
+"""Synthetic benchmarks of every bank format, without the app window.
+
+    python -m benchmark
+    python -m benchmark --banks DIB,CBD --sizes 100,10000 --templates templates/ --out results.json
+
+For every bank and size (100, 10k, 100k and 1M rows by default) a workbook
+shaped like the bank's exports is generated once into the temp directory: junk
+rows above the header, extra columns, blank lines and a total row among the
+data. So is a template per bank, with its placeholders and a customer table of
+the bank's columns: the real templates are not in the repository, --templates
+points at a directory holding them (named as in banks.py, e.g. CBDtemplate.docx)
+and a bank whose template is not there is benchmarked without its document.
+Its invoice is then produced headlessly through banks.py and invoice.py:
+ingestion, totals, document build and, up to --render-rows rows, rendering with
+the configured renderer (nobody waits for Word or LibreOffice to lay out a
+million-row table). The sidecar and PDF caches are off so every run does the
+full work.
+
+The results file has one entry per bank, size and stage: the stages of
+timings.py, plus "ingestion", "document" and "render" totals. Times are the best
+of --repeat runs without memory tracing, peak_mb comes from one more traced run
+(without rendering, the renderer's memory is another process's anyway).
+
+Regression gate, before shipping a build:
+
+    python -m benchmark --check
+    python -m benchmark --check --threshold 15 --memory-threshold 5
+
+reruns the banks and sizes of benchmark-baseline.json and fails (exit code 1)
+when an ingestion or document stage got slower than the threshold (25%) or its
+peak memory grew past the memory threshold (10%). Rendering is not gated, and
+neither are the document stages of a bank whose template is missing, or when
+the baseline was recorded with other templates: they are listed as skipped.
+Timings only compare on the same machine: after a deliberate change, or on a
+new build machine, record the baseline again and commit it, from a checkout
+with the synthetic templates so anyone can rerun it:
+
+    python -m benchmark --update-baseline --sizes 100,10000,100000
+"""
+import argparse
+import gc
+import os
+import json
+import platform
+import sys
+import zipfile
+from datetime import datetime
+from os import path
+from random import Random
+from tempfile import gettempdir
+from xml.sax.saxutils import escape
+from docx import Document
+
+# Every run reads the workbook and builds the PDF, nothing comes from a cache
+os.environ["INVOICE_SIDECAR_CACHE"] = "0"
+os.environ["INVOICE_PDF_CACHE"] = "0"
+
+from banks import BANKS, load_rows
+from ingestion import resource_path
+from invoice import InvoiceJob
+from pdf_overlay import overlay_enabled
+from renderers import renderer_name
+from timings import Run
+from workspace import job_workspace, document_path
+
+RESULTS_FORMAT = 1
+SIZES = (100, 10_000, 100_000, 1_000_000)
+RENDER_ROWS = 10_000
+WORKBOOK_DIR = path.join(gettempdir(), "invoice-benchmark")
+# Bump when the generated workbooks or templates change so stale ones are not reused
+WORKBOOK_VERSION = 1
+TEMPLATE_VERSION = 1
+SYNTHETIC_TEMPLATES = "synthetic"
+
+INGESTION_STAGES = ("open and header scan", "read", "calculate", "model")
+DOCUMENT_STAGES = ("template", "totals", "placeholders", "cache key", "build", "save", "build and save (streamed)")
+RENDER_STAGES = ("overlay template", "overlay render", "convert")
+TOTALS = {"ingestion": INGESTION_STAGES, "document": DOCUMENT_STAGES, "render": RENDER_STAGES}
+
+BASELINE_FILE = "benchmark-baseline.json"
+# Rendering is left out of the gate, Word and LibreOffice vary more than the code does
+GATED_STAGES = INGESTION_STAGES + DOCUMENT_STAGES + ("ingestion", "document")
+THRESHOLD = 25
+MEMORY_THRESHOLD = 10
+# Smaller differences are noise, not regressions
+MIN_SECONDS = 0.05
+MIN_MB = 1.0
+CHECK_REPEAT = 3
+
+FIRST_NAMES = ("Ahmed", "Fatima", "John", "Priya", "Omar", "Maria", "Wei", "Aisha", "Ravi", "Sara")
+LAST_NAMES = ("Khan", "Al Mansoori", "Smith", "Nair", "Haddad", "Garcia", "Chen", "Rahman", "Iyer", "Joseph")
+
+
+def customer_name(i):
+    return f"{FIRST_NAMES[i % 10]} {LAST_NAMES[i // 10 % 10]} {i}"
+
+
+def amount(rnd):
+    # Exports mix plain numbers and text with thousands separators
+    value = round(rnd.uniform(5_000, 750_000), 2)
+    return f"{value:,.2f}" if rnd.random() < 0.2 else value
+
+
+# Header and row maker of each bank's export, the columns the app reads plus a few it ignores
+WORKBOOKS = {
+    "ADIB": (
+        ("Sr No", "Customer Name", "Contract Amt", "Branch"),
+        lambda i, rnd: (i, customer_name(i), amount(rnd), "Dubai Main"),
+    ),
+    "DIB": (
+        ("Sr No", "App ID", "Customer Name", "Financial Amount", "Rate", "Product"),
+        lambda i, rnd: (i, f"DIB{i:08d}", customer_name(i), amount(rnd), rnd.choice((0.01, 0.0125, 0.015)), "Auto"),
+    ),
+    "CBD": (
+        ("LMF", "Customer Name", "Booked", "Booking Date"),
+        lambda i, rnd: (f"LMF{i:07d}", customer_name(i), amount(rnd), "15/01/2026"),
+    ),
+    "MASHREQ": (
+        ("EDMS No", "Disbursal Type", "Customer Name", "Loan Amount", "Channel"),
+        lambda i, rnd: (f"E{i:09d}", rnd.choice(("New", "Top Up", "Buyout")), customer_name(i), amount(rnd), "Broker"),
+    ),
+}
+
+JUNK_ROWS = (
+    ("Monthly disbursal report",),
+    (),
+    ("Broker:", "Synthetic benchmark"),
+    ("Generated on", "01/02/2026"),
+    (),
+)
+
+
+def column_letter(index):
+    letters = ""
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(65 + remainder) + letters
+    return letters
+
+
+def row_xml(number, values):
+    cells = []
+    for index, value in enumerate(values):
+        ref = f"{column_letter(index)}{number}"
+        if isinstance(value, (int, float)):
+            cells.append(f'<c r="{ref}"><v>{value!r}</v></c>')
+        else:
+            cells.append(f'<c r="{ref}" t="inlineStr"><is><t>{escape(value)}</t></is></c>')
+    return f'<row r="{number}">{"".join(cells)}</row>'
+
+
+XLSX_PARTS = {
+    "[Content_Types].xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    "_rels/.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="xl/workbook.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"/>'
+        '</Relationships>'
+    ),
+    "xl/workbook.xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Sheet1" sheetId="1" r:id="rId1"/></sheets></workbook>'
+    ),
+    "xl/_rels/workbook.xml.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="worksheets/sheet1.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet"/>'
+        '</Relationships>'
+    ),
+}
+
+
+def sheet_rows(bank, rows, seed):
+    header, make_row = WORKBOOKS[bank]
+    rnd = Random(f"{seed}-{bank}-{rows}")
+    yield from JUNK_ROWS
+    yield header
+    for i in range(1, rows + 1):
+        yield make_row(i, rnd)
+        # Blank lines now and then, they are dropped by ingestion
+        if i % 997 == 0:
+            yield ()
+    yield ("", "Total")
+
+
+def write_workbook(bank, rows, workbook_path, seed=0):
+    """Writes a synthetic .xlsx, streamed so a million rows never sit in memory."""
+    # One row of XML per row, without openpyxl (not a dependency, and slow at this size)
+    width = len(WORKBOOKS[bank][0])
+    temp_path = workbook_path + ".tmp"
+    with zipfile.ZipFile(temp_path, "w", zipfile.ZIP_DEFLATED) as package:
+        for name, xml in XLSX_PARTS.items():
+            package.writestr(name, xml)
+        with package.open("xl/worksheets/sheet1.xml", "w", force_zip64=True) as sheet:
+            sheet.write(
+                '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                f'<dimension ref="A1:{column_letter(width - 1)}{rows + len(JUNK_ROWS) + rows // 997 + 2}"/>'
+                '<sheetData>'.encode()
+            )
+            chunk = []
+            for number, values in enumerate(sheet_rows(bank, rows, seed), start=1):
+                chunk.append(row_xml(number, values))
+                if len(chunk) == 5000:
+                    sheet.write("".join(chunk).encode())
+                    chunk = []
+            sheet.write(("".join(chunk) + "</sheetData></worksheet>").encode())
+    os.replace(temp_path, workbook_path)
+
+
+def workbook(bank, rows):
+    """Path of the synthetic workbook of bank with rows customers, generated on first use."""
+    workbook_path = path.join(WORKBOOK_DIR, f"{bank}-{rows}-v{WORKBOOK_VERSION}.xlsx")
+    if not path.exists(workbook_path):
+        os.makedirs(WORKBOOK_DIR, exist_ok=True)
+        print(f"Generating {path.basename(workbook_path)}...")
+        write_workbook(bank, rows, workbook_path)
+    return workbook_path
+
+
+def write_template(bank, template_path):
+    """Writes a template with the bank's placeholders around a customer table of its columns."""
+    doc = Document()
+    # The keys of bank.header()
+    doc.add_paragraph("Invoice [invoice no] dated [date today]")
+    doc.add_paragraph("For [FullMonth year] / [month year]")
+
+    # The first row names the columns, "Customer Name" is how the customer table is found
+    table = doc.add_table(rows=1, cols=len(bank.ROW_LAYOUT), style="Table Grid")
+    for cell, (kind, name) in zip(table.rows[0].cells, bank.ROW_LAYOUT):
+        cell.text = name.title()
+
+    for key in bank.totals(bank.new_rows()):
+        doc.add_paragraph(f"{key.strip('[]').title()}: {key}")
+    doc.save(template_path)
+
+
+def template(bank, template_dir=None):
+    """Template of bank from template_dir, or its synthetic one generated on first use.
+
+    None when template_dir has no template for the bank.
+    """
+    if template_dir:
+        template_path = path.join(template_dir, bank.TEMPLATE)
+        return template_path if path.exists(template_path) else None
+
+    template_path = path.join(WORKBOOK_DIR, f"{bank.BANK}-template-v{TEMPLATE_VERSION}.docx")
+    if not path.exists(template_path):
+        os.makedirs(WORKBOOK_DIR, exist_ok=True)
+        write_template(bank, template_path)
+    return template_path
+
+
+def measure(bank, workbook_path, template_path, render, trace_memory):
+    """Timings record of one headless invoice run (see timings.py)."""
+    # Garbage left by the previous case would be collected in the middle of this one
+    gc.collect()
+    timings = Run("benchmark", trace_memory=trace_memory)
+    try:
+        rows = load_rows(bank, workbook_path, timings)
+        if template_path:
+            job = InvoiceJob(bank, rows, "001/2026", "01/02/2026", "Jan 2026", template_path, timings)
+            with job_workspace() as workspace:
+                if render:
+                    job.write(path.join(workspace, "invoice.pdf"))
+                else:
+                    job.save_docx(document_path(workspace))
+    finally:
+        record = timings.result()
+    return record
+
+
+def add_totals(record):
+    stages = record["stages"]
+    for total, names in TOTALS.items():
+        parts = [stages[name] for name in names if name in stages]
+        if parts:
+            stages[total] = {"seconds": sum(part["seconds"] for part in parts)}
+            peaks = [part["peak_mb"] for part in parts if "peak_mb" in part]
+            if peaks:
+                stages[total]["peak_mb"] = max(peaks)
+    return stages
+
+
+def run_case(bank, rows, template_path, repeat=1, render_rows=RENDER_ROWS):
+    """Benchmark entries of one bank and size."""
+    workbook_path = workbook(bank.BANK, rows)
+    render = template_path is not None and rows <= render_rows
+    entries = []
+    best = {}
+    backend = None
+    try:
+        for _ in range(repeat):
+            record = measure(bank, workbook_path, template_path, render, False)
+            backend = record.get("backend")
+            for name, stage in add_totals(record).items():
+                if name not in best or stage["seconds"] < best[name]["seconds"]:
+                    best[name] = stage
+        memory = add_totals(measure(bank, workbook_path, template_path, False, True))
+    except Exception as e:
+        return [{"bank": bank.BANK, "rows": rows, "stage": "error", "error": f"{type(e).__name__}: {e}"}]
+
+    for name, stage in best.items():
+        entry = {"bank": bank.BANK, "rows": rows, "stage": name, "seconds": round(stage["seconds"], 4)}
+        if "peak_mb" in memory.get(name, {}):
+            entry["peak_mb"] = memory[name]["peak_mb"]
+        if name in TOTALS and stage["seconds"]:
+            entry["rows_per_second"] = round(rows / stage["seconds"])
+        if name == "ingestion":
+            # Big workbooks are read by another backend, see readers.STREAMING_FILE_SIZE
+            entry["backend"] = backend
+        entries.append(entry)
+    if template_path is None:
+        entries.append({"bank": bank.BANK, "rows": rows, "stage": "document", "skipped": f"{bank.TEMPLATE} not found"})
+    elif not render:
+        reason = f"more than {render_rows} rows" if render_rows else "rendering off"
+        entries.append({"bank": bank.BANK, "rows": rows, "stage": "render", "skipped": reason})
+    return entries
+
+
+def machine():
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "frozen": bool(getattr(sys, "frozen", False)),
+        "engine": "overlay" if overlay_enabled() else renderer_name(),
+    }
+
+
+def run_benchmarks(banks, sizes, template_dir=None, repeat=1, render_rows=RENDER_ROWS):
+    """Runs every bank and size, returns the results document."""
+    results = []
+    for bank_name in banks:
+        bank = BANKS[bank_name]
+        template_path = template(bank, template_dir)
+        if template_path is None:
+            print(f"{bank.TEMPLATE} not found in {template_dir}, {bank_name} is benchmarked without its document")
+        for rows in sizes:
+            entries = run_case(bank, rows, template_path, repeat, render_rows)
+            for entry in entries:
+                print(format_entry(entry))
+            results += entries
+
+    return {
+        "format": RESULTS_FORMAT,
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "machine": machine(),
+        "templates": path.abspath(template_dir) if template_dir else SYNTHETIC_TEMPLATES,
+        "repeat": repeat,
+        "results": results,
+    }
+
+
+def format_entry(entry):
+    label = f"{entry['bank']:<8}{entry['rows']:>9}  {entry['stage']:<26}"
+    if "error" in entry:
+        return label + "error: " + entry["error"]
+    if "skipped" in entry:
+        return label + "skipped: " + entry["skipped"]
+    peak = f"{entry['peak_mb']:8.1f} MB" if "peak_mb" in entry else ""
+    backend = f"  ({entry['backend']})" if entry.get("backend") else ""
+    return label + f"{entry['seconds']:9.3f}s" + peak + backend
+
+
+def regressed(old, new, threshold, minimum):
+    # Below minimum a difference is noise (a 100 row workbook is read in milliseconds)
+    return new - old > max(old * threshold / 100, minimum)
+
+
+def compare(baseline, results, threshold=THRESHOLD, memory_threshold=MEMORY_THRESHOLD):
+    """Regressions of results against baseline, and the stages left out, as printable lines."""
+    current = {(entry["bank"], entry["rows"], entry["stage"]): entry for entry in results["results"]}
+    # Only the cases of this run, --banks and --sizes can pick a few of the baseline's
+    cases = {(bank, rows) for bank, rows, stage in current}
+    # Documents built from other templates do not compare
+    same_templates = baseline.get("templates", SYNTHETIC_TEMPLATES) == results["templates"]
+    regressions, skipped = [], []
+    for old in baseline["results"]:
+        if old["stage"] not in GATED_STAGES or "seconds" not in old or (old["bank"], old["rows"]) not in cases:
+            continue
+        label = f"{old['bank']:<8}{old['rows']:>9}  {old['stage']:<26}"
+        if old["stage"] in DOCUMENT_STAGES + ("document",):
+            missing = current.get((old["bank"], old["rows"], "document"), {}).get("skipped")
+            if missing or not same_templates:
+                skipped.append(label + (missing or f"baseline recorded with the templates {baseline.get('templates')}"))
+                continue
+        new = current.get((old["bank"], old["rows"], old["stage"]))
+        if new is None:
+            error = current.get((old["bank"], old["rows"], "error"))
+            regressions.append(label + (f"error: {error['error']}" if error else "not measured"))
+            continue
+
+        if regressed(old["seconds"], new["seconds"], threshold, MIN_SECONDS):
+            regressions.append(label + f"{old['seconds']:.3f}s -> {new['seconds']:.3f}s "
+                                       f"(+{(new['seconds'] / old['seconds'] - 1) * 100:.0f}%)")
+        if "peak_mb" in old and "peak_mb" in new and regressed(old["peak_mb"], new["peak_mb"], memory_threshold, MIN_MB):
+            regressions.append(label + f"{old['peak_mb']:.1f} MB -> {new['peak_mb']:.1f} MB")
+    return regressions, skipped
+
+
+def baseline_cases(baseline):
+    """Banks and sizes measured in the baseline, in its order."""
+    banks, sizes = [], []
+    for entry in baseline["results"]:
+        if entry["bank"] not in banks:
+            banks.append(entry["bank"])
+        if entry["rows"] not in sizes:
+            sizes.append(entry["rows"])
+    return banks, sizes
+
+
+def check(baseline_path, results, threshold, memory_threshold):
+    """Prints the regressions against the baseline, returns the exit code (1 when anything regressed)."""
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+
+    # Timings of another machine or Python say little about this one
+    for key, value in baseline["machine"].items():
+        if key != "engine" and results["machine"].get(key) != value:
+            print(f"Warning: the baseline was recorded with {key} {value}, "
+                  f"this run has {results['machine'].get(key)}. Re-record it with --update-baseline.")
+
+    regressions, skipped = compare(baseline, results, threshold, memory_threshold)
+    if skipped:
+        print(f"\n{len(skipped)} stage(s) of the baseline not compared:")
+        for line in skipped:
+            print("  " + line)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) against {baseline_path} "
+              f"(threshold {threshold}% time, {memory_threshold}% memory):")
+        for line in regressions:
+            print("  " + line)
+        return 1
+    print(f"\nNo regression against {baseline_path} (threshold {threshold}% time, {memory_threshold}% memory)")
+    return 0
+
+
+def parse_list(text, kind=str):
+    return [kind(item.strip()) for item in text.split(",") if item.strip()]
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(prog="python -m benchmark", description="Synthetic benchmarks of every bank format.")
+    parser.add_argument("--banks", default=None, help="comma separated, all banks (or the baseline's) by default")
+    parser.add_argument("--sizes", default=None, help=f"customer rows, comma separated, {','.join(map(str, SIZES))} "
+                                                      "(or the baseline's) by default")
+    parser.add_argument("--templates", default=None, help="directory of the bank templates, synthetic ones by default")
+    parser.add_argument("--repeat", type=int, default=None,
+                        help=f"timed runs per case, the best one is kept (1, {CHECK_REPEAT} with --check)")
+    parser.add_argument("--render-rows", type=int, default=RENDER_ROWS,
+                        help="render the PDF up to this many rows (never with --check or --update-baseline)")
+    parser.add_argument("--out", default="benchmark-results.json", help="results file")
+
+    gate = parser.add_argument_group("regression gate")
+    gate.add_argument("--check", action="store_true", help="fail when a stage regressed against the baseline")
+    gate.add_argument("--update-baseline", action="store_true", help="save this run as the new baseline")
+    gate.add_argument("--baseline", default=resource_path(BASELINE_FILE), help=f"baseline file, {BASELINE_FILE} by default")
+    gate.add_argument("--threshold", type=float, default=THRESHOLD, help=f"allowed slowdown in percent ({THRESHOLD})")
+    gate.add_argument("--memory-threshold", type=float, default=MEMORY_THRESHOLD,
+                      help=f"allowed peak memory growth in percent ({MEMORY_THRESHOLD})")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    banks, sizes = list(BANKS), list(SIZES)
+    if args.check:
+        if not path.exists(args.baseline):
+            print(f"Error: no baseline at {args.baseline}, record one with --update-baseline", file=sys.stderr)
+            return 2
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            banks, sizes = baseline_cases(json.load(f))
+    if args.banks:
+        banks = [bank.upper() for bank in parse_list(args.banks)]
+    if args.sizes:
+        sizes = parse_list(args.sizes, int)
+    unknown = [bank for bank in banks if bank not in BANKS]
+    if unknown:
+        print(f"Error: unknown bank(s) {', '.join(unknown)}, expected {', '.join(BANKS)}", file=sys.stderr)
+        return 2
+
+    gating = args.check or args.update_baseline
+    repeat = args.repeat or (CHECK_REPEAT if gating else 1)
+    render_rows = 0 if gating else args.render_rows
+
+    results = run_benchmarks(banks, sizes, args.templates, repeat, render_rows)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=1)
+    print(f"\nResults saved to {args.out}")
+    failed = any("error" in entry for entry in results["results"])
+
+    if args.check:
+        failed = check(args.baseline, results, args.threshold, args.memory_threshold) or failed
+    if args.update_baseline:
+        if failed:
+            print("Error: the baseline was not updated, some cases failed", file=sys.stderr)
+        else:
+            with open(args.baseline, "w", encoding="utf-8") as f:
+                json.dump(results, f, indent=1)
+            print(f"Baseline saved to {args.baseline}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,53 @@
+"""Streaming output of invoices with very large customer tables.
+
+Even built in bulk, a customer table of 100k rows is a python-docx/lxml tree of
+millions of elements that has to sit in memory until doc.save(). For big months
+the rows are never added to the tree: the filled template (placeholders and
+totals already in) is saved once with a marker where the rows belong, then
+copied into the output archive while word/document.xml is re-written as head,
+the customer rows generated batch by batch from the row model, and tail.
+Peak memory stays at the size of the template plus one batch of rows.
+"""
+from io import BytesIO
+from zipfile import ZipFile, ZIP_DEFLATED
+from lxml import etree
+from table_builder import set_font_size
+
+# Invoices with more rows than this are streamed instead of built in memory
+STREAMING_ROWS = 20000
+ROWS_MARKER = "invoice-rows"
+
+
+def save_streaming(doc, table, builder, rows, output):
+    """Saves doc to output (a path or file object) with rows appended to table.
+
+    table is the customer table of doc and builder the table_builder.RowBuilder
+    producing its rows; rows is an iterable of tuples of cell texts, consumed once.
+    """
+    tbl = table._tbl
+    set_font_size(tbl, builder.font_size)
+
+    # The rows go right after the last row of the table, where the marker sits
+    marker = etree.Comment(ROWS_MARKER)
+    tbl.append(marker)
+    package = BytesIO()
+    try:
+        doc.save(package)
+    finally:
+        tbl.remove(marker)
+
+    document_name = doc.part.partname.lstrip("/")
+    marker_bytes = etree.tostring(marker)
+
+    with ZipFile(package) as source, ZipFile(output, "w", ZIP_DEFLATED) as target:
+        for info in source.infolist():
+            if info.filename != document_name:
+                target.writestr(info, source.read(info.filename))
+                continue
+
+            head, tail = source.read(document_name).split(marker_bytes, 1)
+            with target.open(document_name, "w") as stream:
+                stream.write(head)
+                for xml in builder.iter_batches(rows):
+                    stream.write(xml.encode("utf-8"))
+                stream.write(tail)
@@ -0,0 +1,231 @@
+"""Column-wise ingestion of bank disbursal workbooks.
+
+The bank modules used to walk every row of the sheet with iterrows() and clean
+each cell one at a time. Here the header is located once, and the rows below it
+are cleaned/converted a whole column at a time.
+
+The sheet is streamed through readers.iter_sheet_rows() and handed out in
+batches of BATCH_SIZE rows, so the full sheet is never held as a DataFrame.
+The header is looked for in the first HEADER_PROBE_ROWS rows only, a sheet
+without one is not streamed to the end before the error. The header
+offset/column positions are remembered per bank and file type in
+header_cache.json; a repeat monthly load jumps straight to the cached header
+row and only falls back to scanning for it when the layout has changed.
+Reloading an unchanged workbook is served from sidecar_cache instead.
+"""
+from pandas import DataFrame, concat, to_numeric
+from readers import iter_sheet_rows, cell_text, last_read
+from time import perf_counter
+import sidecar_cache
+import json
+import sys
+from os import path
+
+HEADER_MARKER = "customer name"
+HEADER_PROBE_ROWS = 50
+HEADER_CACHE_FILE = "header_cache.json"
+BATCH_SIZE = 5000
+
+# Reader backend, time spent reading/cleaning and rows kept by the most recent load,
+# plus how far into the sheet it got (sheet_rows of total_rows) for progress bars
+last_load = {"backend": None, "read_seconds": 0.0, "header_seconds": 0.0, "rows": 0, "sheet_rows": 0, "total_rows": None}
+
+# Column kinds understood by clean_columns()
+TEXT = "text"                      # stripped string, "" when empty
+NAME = "name"                      # stripped string in Title Case
+NUMBER = "number"                  # numeric, row is dropped when not a number
+NUMBER_OR_ZERO = "number_or_zero"  # numeric, empty cells count as 0
+
+
+def resource_path(relative_path):
+    if getattr(sys, 'frozen', False):
+        base_path = path.dirname(path.abspath(sys.argv[0]))
+    else:
+        base_path = path.dirname(path.abspath(__file__))
+
+    return path.join(base_path, relative_path)
+
+
+def clean_header(values):
+    """Normalises a raw header row: non-breaking spaces removed, stripped, lower case."""
+    return [(cell_text(x) or "").replace('\xa0', '').strip().lower() for x in values]
+
+
+def find_header(rows, marker=HEADER_MARKER, probe_rows=HEADER_PROBE_ROWS):
+    """Consumes rows up to and including the header, looking at the first probe_rows rows only.
+
+    Returns (row position, cleaned header); the rows iterator is left on the first data row.
+    """
+    for position, values in zip(range(probe_rows), rows):
+        header = clean_header(values)
+        if marker in header:
+            return position, header
+
+    raise ValueError("Header must be included in Excel file.")
+
+
+def clean_text_column(column):
+    cleaned = column.str.replace('\xa0', '', regex=False).str.strip()
+    return cleaned.fillna("")
+
+
+def clean_number_column(column):
+    # Drop everything except digits, '.' and '-' (spaces, commas, currency, non-breaking spaces)
+    cleaned = column.str.replace(r'[^\d\.\-]', '', regex=True).str.strip()
+    return to_numeric(cleaned, errors="coerce")
+
+
+def clean_columns(rows, header, columns):
+    """Cleans the requested columns of the rows below the header.
+
+    columns maps the (lower case) Excel header to one of the kinds above.
+    Returns a DataFrame keyed by the same header names.
+    """
+    missing = [name for name in columns if name not in header]
+    if missing:
+        raise ValueError(f"Excel file does not contain the column(s): {', '.join(missing)}")
+
+    data = rows.iloc[:, [header.index(name) for name in columns]].copy()
+    data.columns = list(columns)
+
+    required = []
+    for name, kind in columns.items():
+        if kind == TEXT:
+            data[name] = clean_text_column(data[name])
+        elif kind == NAME:
+            data[name] = clean_text_column(data[name]).str.title()
+        elif kind == NUMBER:
+            data[name] = clean_number_column(data[name])
+            required.append(name)
+        elif kind == NUMBER_OR_ZERO:
+            data[name] = clean_number_column(data[name]).fillna(0.0)
+        else:
+            raise ValueError(f"Unknown column kind: {kind}")
+
+    # Rows whose amounts are not numbers (blank lines, repeated headers, notes...) are skipped
+    if required:
+        data = data.dropna(subset=required)
+
+    return data.reset_index(drop=True)
+
+
+def layout_key(bank, excel_file_path):
+    extension = path.splitext(excel_file_path)[1].lower()
+    return f"{bank}{extension}"
+
+
+def read_header_cache():
+    try:
+        with open(resource_path(HEADER_CACHE_FILE), "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def write_header_cache(cache):
+    # The cache is only an optimisation, a read-only install simply probes every time
+    try:
+        with open(resource_path(HEADER_CACHE_FILE), "w") as f:
+            json.dump(cache, f, indent=2)
+    except OSError:
+        pass
+
+
+def open_rows(excel_file_path, columns, bank=None):
+    """Opens the sheet and positions it on the first data row.
+
+    Returns (rows iterator, selected column positions, their cleaned header).
+    """
+    cache = read_header_cache() if bank else {}
+    key = layout_key(bank, excel_file_path)
+    layout = cache.get(key)
+
+    if layout:
+        rows = iter_sheet_rows(excel_file_path)
+        for position, values in enumerate(rows):
+            if position == layout["header_row"]:
+                header = clean_header(values[p] if p < len(values) else None for p in layout["positions"])
+                if header == layout["header"]:
+                    return rows, layout["positions"], header
+                break
+
+    # No cached layout (or the file no longer matches it), scan for the header row
+    rows = iter_sheet_rows(excel_file_path)
+    header_row, header = find_header(rows)
+
+    missing = [name for name in columns if name not in header]
+    if missing:
+        raise ValueError(f"Excel file does not contain the column(s): {', '.join(missing)}")
+
+    positions = sorted(header.index(name) for name in columns)
+    selected_header = [header[p] for p in positions]
+
+    if bank:
+        cache[key] = {"header_row": header_row, "positions": positions, "header": selected_header}
+        write_header_cache(cache)
+
+    return rows, positions, selected_header
+
+
+def iter_batches(excel_file_path, columns, bank=None, batch_size=BATCH_SIZE):
+    """Yields cleaned DataFrames of at most batch_size rows from the rows below the header.
+
+    Only the current batch is ever held in memory. See clean_columns() for columns.
+    When bank is given, an unchanged workbook is served from the sidecar cache.
+    """
+    last_load.update(backend=None, read_seconds=0.0, header_seconds=0.0, rows=0, sheet_rows=0, total_rows=None)
+    start = perf_counter()
+
+    key = None
+    if bank and sidecar_cache.sidecar_cache_enabled():
+        key = sidecar_cache.cache_key(excel_file_path, bank, columns)
+        cached = sidecar_cache.load(key)
+        if cached is not None:
+            last_load.update(backend="sidecar cache", rows=len(cached), read_seconds=perf_counter() - start,
+                             sheet_rows=len(cached), total_rows=len(cached))
+            for first in range(0, len(cached), batch_size):
+                yield cached.iloc[first:first + batch_size].reset_index(drop=True)
+            return
+
+    rows, positions, header = open_rows(excel_file_path, columns, bank)
+    # Opening the workbook and finding the header row, also counted in read_seconds
+    last_load["header_seconds"] = perf_counter() - start
+    last_load["backend"] = last_read["backend"]
+    last_load["total_rows"] = last_read["total_rows"]
+
+    # Cleaned batches kept for the sidecar cache, dropped once the load gets too big
+    collected = [] if key else None
+
+    batch = []
+    for values in rows:
+        batch.append([cell_text(values[p]) if p < len(values) else None for p in positions])
+        last_load["sheet_rows"] += 1
+        if len(batch) < batch_size:
+            continue
+
+        data = clean_columns(DataFrame(batch, dtype=object), header, columns)
+        batch = []
+        last_load["rows"] += len(data)
+        if collected is not None:
+            collected = collected + [data] if last_load["rows"] <= sidecar_cache.MAX_CACHED_ROWS else None
+
+        last_load["read_seconds"] += perf_counter() - start
+        yield data
+        start = perf_counter()
+
+    data = clean_columns(DataFrame(batch, dtype=object, columns=range(len(positions))), header, columns)
+    last_load["rows"] += len(data)
+    last_load["read_seconds"] += perf_counter() - start
+
+    if collected is not None and last_load["rows"] <= sidecar_cache.MAX_CACHED_ROWS:
+        sidecar_cache.save(key, concat(collected + [data], ignore_index=True))
+
+    if len(data):
+        yield data
+
+
+def load_progress():
+    """(rows kept, fraction of the sheet read or None) of the load in progress."""
+    total = last_load["total_rows"]
+    fraction = min(1.0, last_load["sheet_rows"] / total) if total else None
+    return last_load["rows"], fraction
@@ -0,0 +1,416 @@
+"""Invoice PDFs without the user interface.
+
+InvoiceJob is what "Create Invoice" does once the rows are loaded: fill the
+template, then write the PDF through the PDF cache, the overlay engine or a
+.docx converted by the renderer. The bank windows and the command line below
+both use it, so a headless run goes through the same ingestion, calculations
+and document code as the app (and never imports tkinter):
+
+    python -m invoice generate --bank DIB --input jan.xlsx --invoice-no 042/2026 --month "Jan 2026" --out out.pdf
+
+Month end runs go through the batch command, which spreads the workbooks of a
+directory (or the rows of a CSV manifest) over a process pool sized to the CPU
+count:
+
+    python -m invoice batch --dir brokers/ --month "Jan 2026" --out-dir invoices/
+    python -m invoice batch --manifest jan.csv --month "Jan 2026" --out-dir invoices/
+
+Invoice numbers for every job are reserved in one step before anything runs
+(see invoice_counter.py), and the outputs and failures are listed in
+batch-summary.csv in the output directory. The number given to generate is
+recorded as used too; one already used or reserved is refused unless --force.
+"""
+import argparse
+import csv
+import multiprocessing
+import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from multiprocessing.util import Finalize
+from os import path
+from time import perf_counter
+import renderers
+from banks import BANKS, load_rows
+from invoice_counter import reserve, use, release, number_state, format_number, parse_number, USED
+from readers import BACKENDS
+from templating import compile_template, fill_placeholders
+from table_builder import RowBuilder
+from docx_stream import save_streaming, STREAMING_ROWS
+from workspace import job_workspace, document_path
+from renderers import get_renderer, close_renderer, renderer_name, WORKERS_ENV
+from pdf_overlay import overlay_enabled, template_overlay
+from pdf_cache import pdf_cache_enabled, invoice_key, fetch, store
+from timings import NO_TIMINGS, TIMINGS_ENV, start_run, timings_enabled
+from profiler import PROFILE_ENV, start_capture
+
+BATCH_SUMMARY = "batch-summary.csv"
+SUMMARY_FIELDS = ("input", "bank", "invoice_no", "output", "rows", "seconds", "status", "error")
+
+
+def today():
+    return datetime.today().strftime('%d/%m/%Y')
+
+
+class InvoiceJob:
+    """One invoice ready to be written: the template clone with its placeholders filled.
+
+    Raises ValueError when the template does not fit the bank (no customer table,
+    or a different number of columns). Stages are recorded in timings, see timings.py.
+    """
+
+    def __init__(self, bank, rows, invoice_no, invoice_date, month_year, template_path=None, timings=NO_TIMINGS):
+        self.bank = bank
+        self.rows = rows
+        self.template_path = template_path or bank.template_path()
+        self.timings = timings
+
+        with timings.stage("template"):
+            # Parsed once per template file, every invoice works on an in-memory clone
+            template = compile_template(self.template_path)
+            self.doc, self.customer_table, placeholder_paragraphs = template.clone()
+            if not self.customer_table:
+                raise ValueError("Customer table not found in template.")
+
+            self.builder = RowBuilder(template.prototype_row, bank.TABLE_ALIGNMENTS)
+            self.month_year = month_year.title()
+
+        if overlay_enabled():
+            with timings.stage("overlay template"):
+                # Straight to PDF over the cached template background when enabled, see pdf_overlay.py
+                self.overlay = template_overlay(template)
+        else:
+            self.overlay = None
+
+        with timings.stage("totals", rows=len(rows)):
+            self.replacements = bank.header(invoice_no, invoice_date, month_year)
+            self.replacements.update(bank.totals(rows))
+
+        with timings.stage("placeholders"):
+            # Only the paragraphs indexed as holding placeholders are visited
+            fill_placeholders(placeholder_paragraphs, self.replacements)
+
+        # Identifies the PDF in the content-addressed store, see pdf_cache.py
+        self.pdf_key = None
+        if pdf_cache_enabled():
+            with timings.stage("cache key", rows=len(rows)):
+                engine = "overlay" if self.overlay else renderer_name()
+                self.pdf_key = invoice_key(self.template_path, engine, self.replacements, bank.TABLE_ALIGNMENTS,
+                                           rows.digest(), self.month_year)
+
+    def table_rows(self):
+        # Cell texts are the formatted model rows, the invoice month standing in for the disbursal date
+        return (
+            (self.month_year or values[0],) + values[1:]
+            for values in map(self.rows.display_row, range(len(self.rows)))
+        )
+
+    def write(self, pdf_path):
+        """Writes the invoice PDF. Returns True when it was copied from the PDF cache."""
+        timings = self.timings
+        if self.pdf_key:
+            with timings.stage("cache fetch"):
+                cached = fetch(self.pdf_key, pdf_path)
+            if cached:
+                # The same invoice was rendered before, nothing to build
+                return True
+
+        overlaid = False
+        if self.overlay:
+            with timings.stage("overlay render", rows=len(self.rows)):
+                # False when some text does not fit the template layout, the .docx is rendered instead
+                overlaid = self.overlay.render(self.replacements, self.table_rows(), self.bank.TABLE_ALIGNMENTS,
+                                               pdf_path)
+        if not overlaid:
+            # The .docx only lives in a private temp directory until it is converted
+            with job_workspace() as workspace:
+                docx_path = document_path(workspace)
+                self.save_docx(docx_path)
+                # docx2pdf or the LibreOffice pool, see renderers.py
+                with timings.stage("convert"):
+                    get_renderer().convert(docx_path, pdf_path)
+
+        if self.pdf_key:
+            with timings.stage("cache store"):
+                store(self.pdf_key, pdf_path)
+        return False
+
+    def save_docx(self, docx_path):
+        """Builds the customer table and saves the .docx (once per job, the table is filled in place)."""
+        rows = len(self.rows)
+        # Big months are written straight into the saved file instead of the document tree
+        if rows > STREAMING_ROWS:
+            with self.timings.stage("build and save (streamed)", rows=rows):
+                save_streaming(self.doc, self.customer_table, self.builder, self.table_rows(), docx_path)
+        else:
+            with self.timings.stage("build", rows=rows):
+                self.builder.fill(self.customer_table, self.table_rows())
+            with self.timings.stage("save"):
+                self.doc.save(docx_path)
+
+
+def generate(bank_name, excel_file_path, invoice_no, month_year, pdf_path, invoice_date=None, template_path=None):
+    """Reads a workbook and writes its invoice. Returns the number of customer rows."""
+    bank = BANKS[bank_name]
+    # With INVOICE_PROFILE=1 the run is profiled next to the PDF, see profiler.py
+    capture = start_capture("generate")
+    timings = start_run("generate", bank=bank_name, workbook=path.basename(excel_file_path), invoice_no=invoice_no)
+    try:
+        with capture.finishing(pdf_path):
+            rows = load_rows(bank, excel_file_path, timings)
+            job = InvoiceJob(bank, rows, invoice_no, invoice_date or today(), month_year, template_path, timings)
+            cached = job.write(pdf_path)
+    except Exception as e:
+        timings.finish(status="failed", error=f"{type(e).__name__}: {e}")
+        raise
+    timings.finish(rows=len(rows), cached=cached)
+
+    if cached:
+        print("Invoice copied from the PDF cache")
+    return len(rows)
+
+
+def bank_from_name(file_path):
+    """Bank named in a workbook's file name ('DIB broker jan.xlsx' -> 'DIB'), or None."""
+    words = re.split(r"[^A-Z]+", path.splitext(path.basename(file_path))[0].upper())
+    found = [word for word in words if word in BANKS]
+    return found[0] if found else None
+
+
+def directory_jobs(directory, bank=None):
+    """One job per workbook of a directory, the bank taken from the file name unless given."""
+    jobs = []
+    for name in sorted(os.listdir(directory)):
+        # Skip Excel's lock files of open workbooks and anything that is not a workbook
+        if name.startswith("~$") or path.splitext(name)[1].lower() not in BACKENDS:
+            continue
+        jobs.append({"bank": bank or bank_from_name(name), "input": path.join(directory, name)})
+    return jobs
+
+
+def manifest_jobs(manifest_path, bank=None):
+    """One job per row of a CSV manifest with the columns bank, input and optionally
+    invoice_no, month, date and out. Inputs are relative to the manifest."""
+    base = path.dirname(path.abspath(manifest_path))
+    jobs = []
+    with open(manifest_path, newline="", encoding="utf-8-sig") as f:
+        for row in csv.DictReader(f):
+            row = {key.strip().lower(): (value or "").strip() for key, value in row.items() if key}
+            if not row.get("input"):
+                continue
+
+            job_bank = row.get("bank") or bank or bank_from_name(row["input"])
+            job = {"bank": job_bank.upper() if job_bank else None, "input": path.join(base, row["input"])}
+            for key in ("invoice_no", "month", "date", "out"):
+                if row.get(key):
+                    job[key] = row[key]
+            jobs.append(job)
+    return jobs
+
+
+def summary_row(job, rows="", seconds="", error=None):
+    return {
+        "input": job["input"], "bank": job["bank"] or "", "invoice_no": job.get("invoice_no", ""),
+        "output": "" if error else job["out"], "rows": rows,
+        "seconds": f"{seconds:.2f}" if seconds != "" else "",
+        "status": "failed" if error else "ok", "error": error or "",
+    }
+
+
+def number_taken(state):
+    """How number_state() says a number is taken: 'was already used' or 'is reserved by ...'."""
+    return "was already used" if state[0] == USED else f"is reserved by {state[1]}"
+
+
+def print_result(result, done, total):
+    print(f"[{done}/{total}] {result['status']}: {path.basename(result['input'])}"
+          + (f" - {result['error']}" if result["error"] else f" -> {result['output']}"))
+
+
+def start_batch_worker(word_lock):
+    # Every process gets its own LibreOffice workers (one unless set), Word conversions take turns
+    os.environ[WORKERS_ENV] = os.environ.get(WORKERS_ENV) or "1"
+    renderers.word_lock = word_lock
+    # Pool processes end without running atexit, the workers are closed when the process shuts down
+    Finalize(None, close_renderer, exitpriority=10)
+
+
+def run_job(job):
+    """Runs in a pool process: one invoice, failures are reported in the summary instead of raised."""
+    start = perf_counter()
+    try:
+        rows = generate(job["bank"], job["input"], job["invoice_no"], job["month"], job["out"],
+                        invoice_date=job["date"], template_path=job.get("template"))
+    except Exception as e:
+        return summary_row(job, seconds=perf_counter() - start, error=f"{type(e).__name__}: {e}")
+    return summary_row(job, rows=rows, seconds=perf_counter() - start)
+
+
+def run_batch(jobs, out_dir, month_year=None, invoice_date=None, template_path=None, workers=None):
+    """Generates the invoices of jobs in parallel and writes batch-summary.csv to out_dir.
+
+    Returns the summary rows, in the order of jobs.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    invoice_date = invoice_date or today()
+
+    results = {}
+    ready = []
+    for index, job in enumerate(jobs):
+        job.setdefault("month", month_year)
+        job.setdefault("date", invoice_date)
+        job["out"] = path.join(out_dir, job.get("out") or path.splitext(path.basename(job["input"]))[0] + ".pdf")
+        job["template"] = template_path
+
+        if not job["bank"]:
+            results[index] = summary_row(job, error="Bank not found in the file name, use --bank or a manifest.")
+        elif job["bank"] not in BANKS:
+            results[index] = summary_row(job, error=f"Unknown bank {job['bank']!r}.")
+        elif not job["month"]:
+            results[index] = summary_row(job, error="No invoice month, use --month or the manifest's month column.")
+        else:
+            ready.append((index, job))
+
+    for done, result in enumerate(results.values(), 1):
+        print_result(result, done, len(jobs))
+
+    # Numbers given in the manifest are recorded as used too, after a warning when already taken
+    for index, job in ready:
+        typed = parse_number(job["invoice_no"]) if job.get("invoice_no") else None
+        state = number_state(typed) if typed is not None else None
+        if state:
+            print(f"Warning: invoice number {typed} of {path.basename(job['input'])} {number_taken(state)}")
+        job["number"] = typed
+
+    # Numbers are handed out in job order before anything runs, so parallel jobs never share one
+    numbered = [job for index, job in ready if not job.get("invoice_no")]
+    if numbered:
+        for job, number in zip(numbered, reserve(len(numbered), owner=f"batch {out_dir}")):
+            job["number"] = number
+            job["reserved"] = True
+            job["invoice_no"] = format_number(number, job["date"].split("/")[-1])
+
+    # The template backgrounds are rendered once here rather than by every process
+    if overlay_enabled():
+        for template in {job["template"] or BANKS[job["bank"]].template_path() for index, job in ready}:
+            try:
+                template_overlay(compile_template(template))
+            except Exception:
+                pass
+
+    workers = min(workers or os.cpu_count() or 1, max(len(ready), 1))
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=start_batch_worker,
+                                 initargs=(multiprocessing.Lock(),)) as pool:
+            futures = {pool.submit(run_job, job): (index, job) for index, job in ready}
+            for future in as_completed(futures):
+                index, job = futures[future]
+                try:
+                    results[index] = future.result()
+                except Exception as e:
+                    # The process itself died (out of memory, killed...)
+                    results[index] = summary_row(job, error=f"{type(e).__name__}: {e}")
+
+                print_result(results[index], len(results), len(jobs))
+    finally:
+        # Numbers of failed or unfinished jobs go back to the counter for the next invoices
+        statuses = {index: results.get(index, {}).get("status") for index, job in ready}
+        use([job["number"] for index, job in ready if job["number"] is not None and statuses[index] == "ok"],
+            owner=f"batch {out_dir}")
+        release([job["number"] for index, job in ready if job.get("reserved") and statuses[index] != "ok"])
+
+    summary = [results[index] for index in range(len(jobs))]
+    with open(path.join(out_dir, BATCH_SUMMARY), "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=SUMMARY_FIELDS)
+        writer.writeheader()
+        writer.writerows(summary)
+    return summary
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(prog="python -m invoice", description="Generate invoices without the app window.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    command = commands.add_parser("generate", help="write the invoice PDF of one bank workbook")
+    command.add_argument("--bank", required=True, type=str.upper, choices=sorted(BANKS))
+    command.add_argument("--input", required=True, help="bank workbook (.xlsx, .xls, .ods)")
+    command.add_argument("--invoice-no", required=True, help='e.g. "042/2026"')
+    command.add_argument("--force", action="store_true", help="print the invoice number even if already used or reserved")
+    command.add_argument("--month", required=True, help='invoice month, e.g. "Jan 2026"')
+    command.add_argument("--date", default=None, help="invoice date, today (dd/mm/yyyy) by default")
+    command.add_argument("--out", required=True, help="PDF to write")
+    command.add_argument("--template", default=None, help="template .docx instead of the bank's own")
+    command.add_argument("--timings", action="store_true", help="record per-stage timings, see timings.py")
+    command.add_argument("--profile", action="store_true", help="write cProfile and tracemalloc stats next to the PDF")
+
+    command = commands.add_parser("batch", help="write the invoices of many workbooks in parallel")
+    source = command.add_mutually_exclusive_group(required=True)
+    source.add_argument("--dir", help="directory of workbooks, the bank is taken from each file name")
+    source.add_argument("--manifest", help="CSV with the columns bank, input[, invoice_no, month, date, out]")
+    command.add_argument("--out-dir", required=True, help="directory for the PDFs and batch-summary.csv")
+    command.add_argument("--bank", type=str.upper, choices=sorted(BANKS), help="bank of every workbook")
+    command.add_argument("--month", default=None, help='invoice month, e.g. "Jan 2026"')
+    command.add_argument("--date", default=None, help="invoice date, today (dd/mm/yyyy) by default")
+    command.add_argument("--template", default=None, help="template .docx instead of the bank's own")
+    command.add_argument("--workers", type=int, default=None, help="processes, the CPU count by default")
+    command.add_argument("--timings", action="store_true", help="record per-stage timings, see timings.py")
+    return parser.parse_args(argv)
+
+
+def batch(args):
+    try:
+        if args.dir:
+            jobs = directory_jobs(args.dir, args.bank)
+        else:
+            jobs = manifest_jobs(args.manifest, args.bank)
+        summary = run_batch(jobs, args.out_dir, args.month, args.date, args.template, args.workers)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+    failed = sum(result["status"] == "failed" for result in summary)
+    print(f"{len(summary) - failed} invoices written, {failed} failed, see {path.join(args.out_dir, BATCH_SUMMARY)}")
+    return 1 if failed else 0
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.timings and not timings_enabled():
+        # Through the environment so the batch pool processes record their invoices too
+        os.environ[TIMINGS_ENV] = "1"
+
+    if args.command == "batch":
+        return batch(args)
+    if args.profile:
+        os.environ[PROFILE_ENV] = "1"
+
+    # Like a number typed in a bank window, one already printed or held elsewhere is checked first
+    typed = parse_number(args.invoice_no)
+    state = number_state(typed) if typed is not None else None
+    if state and not args.force:
+        print(f"Error: invoice number {typed} {number_taken(state)}, use --force to print it anyway", file=sys.stderr)
+        return 1
+
+    try:
+        rows = generate(args.bank, args.input, args.invoice_no, args.month, args.out,
+                        invoice_date=args.date, template_path=args.template)
+    except FileNotFoundError as e:
+        print(f"Error: file not found: {e.filename}", file=sys.stderr)
+        return 1
+    except (ValueError, IndexError, RuntimeError, PermissionError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+    # MARK THE INVOICE NUMBER AS USED (invoice_counter.py), windows and batches never hand it out again
+    if typed is not None:
+        use([typed], owner=f"generate {args.out}")
+    print(f"Invoice {args.invoice_no} ({rows} rows) saved to {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    # Needed by the batch pool in frozen Windows builds
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -0,0 +1,162 @@
+"""Invoice numbers, handed out atomically.
+
+counter.txt used to be read when a bank window opened and rewritten once the
+PDF was saved, so two windows (or a batch running next to one) could print the
+same number. Numbers now come from counter.db, a small SQLite database next to
+the app, and every change is a write transaction that other processes wait for:
+
+- reserve() takes the next numbers, a whole block for a batch, at once;
+- use() records numbers as printed on an invoice, they stay in the database so
+  number_state() can tell a number typed by hand was already used;
+- release() gives back numbers that were not used (window closed, save
+  cancelled, batch job failed). reserve() hands those out again first.
+
+Reservations neither used nor released (the app was killed) are recovered after
+STALE_HOURS. counter.txt is kept as a readable copy of the next number and a
+bigger number written there by hand still skips ahead.
+"""
+import os
+import sqlite3
+from contextlib import contextmanager
+from time import time
+from ingestion import resource_path
+
+COUNTER_DB = "counter.db"
+COUNTER_FILE = "counter.txt"
+# Seconds a process waits for another one's transaction before giving up
+LOCK_TIMEOUT = 30
+STALE_HOURS = 24
+
+RESERVED = "reserved"
+RELEASED = "released"
+USED = "used"
+
+
+def connect():
+    connection = sqlite3.connect(resource_path(COUNTER_DB), timeout=LOCK_TIMEOUT, isolation_level=None)
+    connection.execute("CREATE TABLE IF NOT EXISTS counter (id INTEGER PRIMARY KEY CHECK (id = 1), next INTEGER NOT NULL)")
+    connection.execute(
+        "CREATE TABLE IF NOT EXISTS numbers (number INTEGER PRIMARY KEY, state TEXT NOT NULL, owner TEXT, updated REAL NOT NULL)"
+    )
+    return connection
+
+
+@contextmanager
+def transaction():
+    connection = connect()
+    try:
+        # Takes the write lock up front, so two processes never read the same next number
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield connection
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+    finally:
+        connection.close()
+
+
+def read_counter_file():
+    try:
+        with open(resource_path(COUNTER_FILE), "r") as f:
+            return int(f.readline().split(" ")[-1])
+    except (OSError, ValueError):
+        return None
+
+
+def write_counter_file(next_number):
+    try:
+        with open(resource_path(COUNTER_FILE), "w") as f:
+            f.write(f"Next Invoice Number : {next_number}")
+    except OSError:
+        pass
+
+
+def next_number(connection):
+    row = connection.execute("SELECT next FROM counter WHERE id = 1").fetchone()
+    # counter.txt seeds a new database, and can be raised by hand to skip numbers
+    return max(row[0] if row else 1, read_counter_file() or 1)
+
+
+def set_next_number(connection, number):
+    connection.execute("INSERT OR REPLACE INTO counter (id, next) VALUES (1, ?)", (number,))
+
+
+def stale_before(now):
+    return now - STALE_HOURS * 3600
+
+
+def reserve(count=1, owner=None):
+    """Reserves count invoice numbers in one transaction, given back ones first (lowest first)."""
+    owner = owner or f"pid {os.getpid()}"
+    now = time()
+    with transaction() as connection:
+        # Reservations left behind by a window or batch that never finished are given out again
+        connection.execute("UPDATE numbers SET state = ? WHERE state = ? AND updated < ?",
+                           (RELEASED, RESERVED, stale_before(now)))
+        numbers = [number for number, in connection.execute(
+            "SELECT number FROM numbers WHERE state = ? ORDER BY number LIMIT ?", (RELEASED, count))]
+
+        first_new = next_number(connection)
+        following = first_new + count - len(numbers)
+        numbers += range(first_new, following)
+        set_next_number(connection, following)
+
+        connection.executemany("INSERT OR REPLACE INTO numbers (number, state, owner, updated) VALUES (?, ?, ?, ?)",
+                               [(number, RESERVED, owner, now) for number in numbers])
+
+    write_counter_file(following)
+    return numbers
+
+
+def use(numbers, owner=None):
+    """Records numbers as printed on an invoice, they are never handed out again."""
+    if not numbers:
+        return
+    owner = owner or f"pid {os.getpid()}"
+    now = time()
+    with transaction() as connection:
+        connection.executemany("INSERT OR REPLACE INTO numbers (number, state, owner, updated) VALUES (?, ?, ?, ?)",
+                               [(number, USED, owner, now) for number in numbers])
+        # A number typed by hand past the counter moves the counter along
+        following = max(next_number(connection), max(numbers) + 1)
+        set_next_number(connection, following)
+
+    write_counter_file(following)
+
+
+def release(numbers):
+    """Gives back reserved numbers that no invoice was saved with."""
+    if not numbers:
+        return
+    now = time()
+    with transaction() as connection:
+        connection.executemany("UPDATE numbers SET state = ?, updated = ? WHERE number = ? AND state = ?",
+                               [(RELEASED, now, number, RESERVED) for number in numbers])
+
+
+def number_state(number):
+    """(state, owner) of an invoice number: USED, or RESERVED while a window or batch holds it.
+
+    None when the number is free (never handed out, released or left behind).
+    """
+    connection = connect()
+    try:
+        row = connection.execute("SELECT state, owner, updated FROM numbers WHERE number = ?", (number,)).fetchone()
+    finally:
+        connection.close()
+    if row is None or row[0] == RELEASED or (row[0] == RESERVED and row[2] < stale_before(time())):
+        return None
+    return row[0], row[1]
+
+
+def format_number(number, year):
+    """42, '2026' -> '042/2026'"""
+    return f"{str(number).zfill(3)}/{year}"
+
+
+def parse_number(invoice_no):
+    """'042/2026' -> 42, None when the invoice number does not start with a number."""
+    number = invoice_no.split("/")[0].strip()
+    return int(number) if number.isdigit() else None
@@ -4,6 +4,7 @@ from tkinter import Tk, Toplevel, TclError
 from tkinter import messagebox, Label
 from tkinter import ttk, StringVar
 from tkinter import filedialog, Button
+from prewarm import start_prewarm
 
 #TODO: ADD INSTRUCTIONS
 print("PRE REQUISITES >")
@@ -62,6 +63,9 @@ class MainApp:
         # Button to start the process
         start_btn = Button(self.root, text="Load Data", command=self.start_automation)
         start_btn.pack(pady=20)
+
+        # pandas, python-docx... are imported while the user picks a bank and a file, see prewarm.py
+        start_prewarm()
         
     def ask_excel_file(self):
         file_path = filedialog.askopenfilename(
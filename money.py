@@ -0,0 +1,71 @@
+"""Money as int64 cents, computed over whole columns with NumPy.
+
+Incentives, payouts and VAT used to be float arithmetic on the loan amounts,
+rounded to the cent only when stored, and the totals went back to floats for
+the VAT. Now the amounts become cents once, when a batch is read (to_cents),
+and everything after is integer arithmetic:
+
+- payment slabs are integers in millionths of a percent, 1.375% is 1375000
+  (to_slabs), so a bank's rate is never rounded before the incentive is;
+- VAT is 5% of an amount in cents (vat);
+- every division rounds half away from zero to the cent, the way amounts are
+  rounded by hand on an invoice (divide);
+- totals are one exact sum of the column (total).
+
+Functions take and return NumPy arrays (a DataFrame column works too) or
+single integers.
+"""
+import numpy
+
+CENTS = 100
+# Percentages are kept in millionths of a percent
+SLAB_SCALE = 1_000_000
+HUNDRED_PERCENT = 100 * SLAB_SCALE
+VAT_PERCENT = 5
+# Decimal places a float read from a workbook is trusted to (1.005 * 100 is 100.49999999999999)
+FLOAT_DIGITS = 6
+
+
+def round_half_up(values):
+    """Floats -> int64, halves away from zero."""
+    values = numpy.round(numpy.asarray(values, dtype=float), FLOAT_DIGITS)
+    return (numpy.sign(values) * numpy.floor(numpy.abs(values) + 0.5)).astype(numpy.int64)
+
+
+def to_cents(amounts):
+    """Amounts in currency units -> int64 cents."""
+    return round_half_up(numpy.asarray(amounts, dtype=float) * CENTS)
+
+
+def to_slabs(percentages):
+    """Percentages -> int64 millionths of a percent, 1.375 -> 1375000."""
+    return round_half_up(numpy.asarray(percentages, dtype=float) * SLAB_SCALE)
+
+
+def divide(numerators, denominator):
+    """Integer numerators / a positive integer denominator, rounded half away from zero (exact)."""
+    numerators = numpy.asarray(numerators, dtype=numpy.int64)
+    return numpy.sign(numerators) * ((numpy.abs(numerators) * 2 + denominator) // (2 * denominator))
+
+
+def scale(cents, numerator, denominator):
+    """cents * numerator / denominator to the cent, e.g. the payout scale(incentive, 100, 105)."""
+    return divide(numpy.asarray(cents, dtype=numpy.int64) * numerator, denominator)
+
+
+def percent_of(cents, slabs):
+    """slabs percent of cents to the cent, slabs in millionths of a percent.
+
+    For the amounts of one row: cents * slabs has to stay within int64.
+    """
+    return divide(numpy.asarray(cents, dtype=numpy.int64) * slabs, HUNDRED_PERCENT)
+
+
+def vat(cents):
+    """VAT of cents to the cent, totals included."""
+    return scale(cents, VAT_PERCENT, 100)
+
+
+def total(cents):
+    """Exact sum of a column of cents."""
+    return int(numpy.sum(cents, dtype=numpy.int64))
@@ -0,0 +1,77 @@
+"""Content-addressed store of rendered invoice PDFs.
+
+Operators often generate the same invoice again, after dismissing the save
+dialog or to get another copy. Every PDF is stored under the hash of what it is
+rendered from: the template file, the rendering engine, the header fields
+(placeholder replacements, totals included), the table alignments and the rows
+of the model. When that hash is already stored the PDF is copied to the chosen
+path and nothing is built or rendered. INVOICE_PDF_CACHE=0 turns the store off.
+"""
+import json
+import os
+import shutil
+from hashlib import sha1
+from os import path
+from ingestion import resource_path
+from sidecar_cache import CACHE_DIR, file_digest, evict
+
+PDF_CACHE_DIR = "pdf"
+PDF_CACHE_VERSION = 1
+PDF_CACHE_ENV = "INVOICE_PDF_CACHE"
+MAX_PDF_CACHE_BYTES = 500 * 1024 * 1024
+MAX_PDF_AGE_DAYS = 90
+
+
+def pdf_cache_enabled():
+    return os.environ.get(PDF_CACHE_ENV, "1") != "0"
+
+
+def cache_dir():
+    return path.join(resource_path(CACHE_DIR), PDF_CACHE_DIR)
+
+
+def invoice_key(template_path, engine, replacements, alignments, rows_digest, month_year):
+    """Hash of everything an invoice PDF depends on.
+
+    rows_digest is InvoiceRows.digest(), month_year the text shown in the date column.
+    """
+    header = json.dumps(sorted(replacements.items()), ensure_ascii=False)
+    spec = "|".join((
+        str(PDF_CACHE_VERSION), file_digest(template_path), engine, header,
+        repr([getattr(alignment, "name", alignment) for alignment in alignments]), rows_digest, month_year,
+    ))
+    return sha1(spec.encode("utf-8")).hexdigest()
+
+
+def entry_path(key):
+    return path.join(cache_dir(), f"{key}.pdf")
+
+
+def fetch(key, save_path):
+    """Copies the stored PDF for key to save_path. Returns False on a miss."""
+    cached = entry_path(key)
+    try:
+        shutil.copyfile(cached, save_path)
+    except FileNotFoundError:
+        return False
+
+    # Mark as recently used for the eviction order
+    try:
+        os.utime(cached)
+    except OSError:
+        pass
+    return True
+
+
+def store(key, pdf_path):
+    """Keeps a copy of a freshly rendered PDF under key, then evicts old entries."""
+    try:
+        os.makedirs(cache_dir(), exist_ok=True)
+        # Copy under a temporary name first so a crash never leaves a half written entry
+        temp_path = entry_path(key) + ".tmp"
+        shutil.copyfile(pdf_path, temp_path)
+        os.replace(temp_path, entry_path(key))
+    except OSError:
+        return
+
+    evict(MAX_PDF_CACHE_BYTES, MAX_PDF_AGE_DAYS, cache_dir(), ".pdf")
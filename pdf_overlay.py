@@ -0,0 +1,603 @@
+"""Direct PDF rendering of invoices over a pre-rendered template background.
+
+Most of an invoice page is the bank's static letterhead; only the paragraphs
+holding placeholders and the customer rows change. With INVOICE_PDF_ENGINE=overlay
+(and reportlab + pypdf installed) a template is rendered to PDF only once, by the
+regular renderer, and measured:
+
+- the template as it is, which gives the position and lines of every
+  placeholder paragraph;
+- a measuring copy with two marker rows in the customer table, which gives the
+  position of the first row, the row pitch and the column edges;
+- the background, a copy with the placeholder paragraphs emptied (line breaks
+  keep the lines they took), so the layout is unchanged and no placeholder text
+  is left in the PDF.
+
+Each invoice then only draws the filled-in paragraphs and the customer rows with
+reportlab and stacks them on bands of the background with pypdf: the first page
+down to the end of the table, the rows (continuing on new pages that keep the
+letterhead header and footer), then the content that followed the table, moved
+down below the last row. A band only carries the text and paths of the
+background drawn inside it (see band_content), so the text layer of an invoice
+holds every letterhead line once. Text is drawn in Helvetica, so it approximates the
+template fonts. Cell texts are wrapped within their column, the row growing to
+fit them, and paragraphs within their text frame (the page margins or their
+table cell) over the lines the template paragraph spans. An invoice with a
+paragraph needing more lines than that, or a row taller than a page, is not
+overlaid: InvoiceJob renders its .docx instead.
+
+Backgrounds and their measurements are cached in the cache directory under the
+digest of the template file.
+"""
+import json
+import math
+import os
+from hashlib import sha1
+from importlib.util import find_spec
+from io import BytesIO
+from os import path
+from docx.enum.text import WD_ALIGN_PARAGRAPH
+from docx.oxml.ns import qn
+from docx.shared import Pt
+from docx.text.paragraph import Paragraph
+from renderers import get_renderer
+from ingestion import resource_path
+from sidecar_cache import CACHE_DIR, file_digest
+from table_builder import RowBuilder
+from templating import compile_placeholders, paragraph_text, resolve_path, TEXT_TAG
+from workspace import job_workspace
+
+ENGINE_ENV = "INVOICE_PDF_ENGINE"
+ENGINE_MODULES = ("reportlab", "pypdf")
+OVERLAY_VERSION = 3
+FONT = "Helvetica"
+ROW_FONT_SIZE = 10
+# Line height of wrapped text, as a share of the font size (about Word's single spacing)
+LINE_SPACING = 1.2
+# Word's default left/right cell margin
+CELL_PADDING = 5.4
+# Distance from the top of a row to its text baseline, as a share of the row pitch
+BASELINE_RATIO = 0.72
+# Depth of the text below the baseline, as a share of the font size
+DESCENT_RATIO = 0.3
+GRID_WIDTH = 0.5
+MARKER = "#{row}{column}#"
+# Characters of a paragraph used to find it on the rendered page
+MATCH_LENGTH = 40
+DEFAULT_MARGIN = 72
+
+# Content stream operators band_content() follows
+TEXT_SHOWING = (b"Tj", b"TJ", b"'", b'"')
+PATH_BUILDING = (b"m", b"l", b"c", b"v", b"y", b"re", b"h", b"W", b"W*")
+PATH_PAINTING = (b"S", b"s", b"f", b"F", b"f*", b"B", b"B*", b"b", b"b*", b"n")
+IDENTITY = [1, 0, 0, 1, 0, 0]
+
+# TemplateOverlay by template path
+overlays = {}
+
+
+def overlay_enabled():
+    """True when the overlay engine is selected and its optional modules are installed."""
+    if os.environ.get(ENGINE_ENV, "").lower() != "overlay":
+        return False
+    return all(find_spec(name) is not None for name in ENGINE_MODULES)
+
+
+def multiply(m, n):
+    """Product of two PDF matrices [a b c d e f]."""
+    return [
+        m[0] * n[0] + m[1] * n[2], m[0] * n[1] + m[1] * n[3],
+        m[2] * n[0] + m[3] * n[2], m[2] * n[1] + m[3] * n[3],
+        m[4] * n[0] + m[5] * n[2] + n[4], m[4] * n[1] + m[5] * n[3] + n[5],
+    ]
+
+
+def text_lines(pdf_bytes):
+    """Text of a PDF as lines in reading order: (page, y, size, [(char, x), ...]), whitespace left out."""
+    from pypdf import PdfReader
+    from reportlab.pdfbase.pdfmetrics import stringWidth
+
+    lines = {}
+    for number, page in enumerate(PdfReader(BytesIO(pdf_bytes)).pages):
+        def visit(text, cm, tm, font_dict, font_size, number=number):
+            if not text.strip():
+                return
+            m = multiply(tm, cm)
+            size = font_size * (math.hypot(m[0], m[1]) or 1)
+            line = lines.setdefault((number, round(m[5])), [m[5], size, []])
+            for i, char in enumerate(text):
+                if not char.isspace():
+                    line[2].append((char, m[4] + stringWidth(text[:i], FONT, size)))
+
+        page.extract_text(visitor_text=visit)
+
+    ordered = sorted(lines.items(), key=lambda item: (item[0][0], -item[0][1]))
+    return [(number, y, size, sorted(chars, key=lambda c: c[1])) for (number, _), (y, size, chars) in ordered]
+
+
+def locate(lines, text, start=(0, 0)):
+    """Finds text (whitespace ignored) from start = (line index, char index) on.
+
+    Returns (line index, char index, x) of the first match, or None.
+    """
+    needle = "".join(text.split())[:MATCH_LENGTH]
+    if not needle:
+        return None
+    line_index, char_index = start
+    for index in range(line_index, len(lines)):
+        chars = lines[index][3]
+        found = "".join(c for c, _ in chars).find(needle, char_index if index == line_index else 0)
+        if found >= 0:
+            return index, found, chars[found][1]
+    return None
+
+
+def table_has_grid(tbl):
+    """Whether the table draws cell borders (own borders or a grid table style)."""
+    tblPr = tbl.tblPr
+    if tblPr is None:
+        return False
+    if tblPr.find(qn('w:tblBorders')) is not None:
+        return True
+    style = tblPr.find(qn('w:tblStyle'))
+    return style is not None and "grid" in (style.get(qn('w:val')) or "").lower()
+
+
+def alignment_name(paragraph):
+    if paragraph.alignment == WD_ALIGN_PARAGRAPH.RIGHT:
+        return "right"
+    if paragraph.alignment == WD_ALIGN_PARAGRAPH.CENTER:
+        return "center"
+    return "left"
+
+
+def wrap(text, width, size):
+    """Lines of text fitting width points, broken at spaces and line breaks (words wider than a line anywhere)."""
+    from reportlab.pdfbase.pdfmetrics import stringWidth
+
+    lines = []
+    for part in text.replace("\r\n", "\n").replace("\r", "\n").replace("\t", " ").split("\n"):
+        if stringWidth(part, FONT, size) <= width:
+            lines.append(part)
+            continue
+        line = ""
+        for word in part.split(" "):
+            candidate = f"{line} {word}" if line else word
+            if stringWidth(candidate, FONT, size) <= width:
+                line = candidate
+                continue
+            if line:
+                lines.append(line)
+            while len(word) > 1 and stringWidth(word, FONT, size) > width:
+                cut = len(word) - 1
+                while cut > 1 and stringWidth(word[:cut], FONT, size) > width:
+                    cut -= 1
+                lines.append(word[:cut])
+                word = word[cut:]
+            line = word
+        lines.append(line)
+    return lines
+
+
+def line_positions(lines, text, found):
+    """Baselines of the lines spanned by the paragraph text found at found = (line index, char index, x)."""
+    remaining = len("".join(text.split()))
+    line_index, char_index, _ = found
+    page = lines[line_index][0]
+    positions = []
+    while remaining > 0 and line_index < len(lines) and lines[line_index][0] == page:
+        positions.append(lines[line_index][1])
+        remaining -= len(lines[line_index][3]) - char_index
+        line_index, char_index = line_index + 1, 0
+    return positions
+
+
+def text_frame(p, x, text_width, align, page_left, page_right):
+    """(left, right) edges the lines of a paragraph (a w:p element) are wrapped in.
+
+    x and text_width place its first line on the page. The frame is the table cell
+    the paragraph is in, else the page margins, anchored on the side it is aligned to.
+    """
+    center = x + text_width / 2
+    tc = next(p.iterancestors(qn('w:tc')), None)
+    if tc is not None and tc.width is not None:
+        span = tc.width.pt - 2 * CELL_PADDING
+        if align == "right":
+            return x + text_width - span, x + text_width
+        if align == "center":
+            return center - span / 2, center + span / 2
+        return x, x + span
+
+    if align == "right":
+        return page_left, x + text_width
+    if align == "center":
+        half = min(center - page_left, page_right - center)
+        return center - half, center + half
+    return x, page_right
+
+
+def path_points(operands, operator):
+    """(x, y) points of a path building operation."""
+    values = [float(value) for value in operands]
+    if operator == b"re":
+        x, y, w, h = values
+        return [(x, y), (x + w, y), (x, y + h), (x + w, y + h)]
+    return list(zip(values[0::2], values[1::2]))
+
+
+def band_content(page, y0, y1):
+    """Content stream data of a background page keeping only what is drawn between y0 and y1.
+
+    Cropping a merged page hides the rest of it, but its text would still be in the
+    invoice's text layer (search, copy and paste) once per band. Text shown and paths
+    and images painted outside the band are left out; the graphics state, clipping
+    paths and forms are kept as they are.
+    """
+    from pypdf.generic import NameObject
+
+    content = page.get_contents()
+    if content is None:
+        return b""
+    xobjects = page.get("/Resources", {}).get("/XObject", {})
+
+    def inside(points, ctm):
+        ys = [ctm[1] * x + ctm[3] * y + ctm[5] for x, y in points]
+        return bool(ys) and max(ys) >= y0 and min(ys) <= y1
+
+    kept = []
+    ctm, stack = IDENTITY, []
+    tm = tlm = IDENTITY
+    leading = 0
+    path, points = [], []
+    for operands, operator in content.operations:
+        if operator == b"q":
+            stack.append(ctm)
+        elif operator == b"Q":
+            ctm = stack.pop() if stack else IDENTITY
+        elif operator == b"cm":
+            ctm = multiply([float(value) for value in operands], ctm)
+        elif operator == b"BT":
+            tm = tlm = IDENTITY
+        elif operator == b"Tm":
+            tm = tlm = [float(value) for value in operands]
+        elif operator in (b"Td", b"TD"):
+            if operator == b"TD":
+                leading = -float(operands[1])
+            tm = tlm = multiply([1, 0, 0, 1, float(operands[0]), float(operands[1])], tlm)
+        elif operator == b"TL":
+            leading = float(operands[0])
+        elif operator == b"T*":
+            tm = tlm = multiply([1, 0, 0, 1, 0, -leading], tlm)
+
+        if operator in TEXT_SHOWING:
+            if operator != b"Tj" and operator != b"TJ":
+                # ' and " move to the next line first
+                tm = tlm = multiply([1, 0, 0, 1, 0, -leading], tlm)
+            if y0 <= multiply(tm, ctm)[5] <= y1:
+                kept.append((operands, operator))
+            elif operator == b"'":
+                kept.append(([], b"T*"))
+            elif operator == b'"':
+                kept += [([operands[0]], b"Tw"), ([operands[1]], b"Tc"), ([], b"T*")]
+        elif operator in PATH_BUILDING:
+            path.append((operands, operator))
+            points += path_points(operands, operator) if operator not in (b"h", b"W", b"W*") else []
+        elif operator in PATH_PAINTING:
+            path.append((operands, operator))
+            # A clipping path applies to everything after it
+            if any(op in (b"W", b"W*") for _, op in path) or inside(points, ctm):
+                kept += path
+            path, points = [], []
+        elif operator == b"Do":
+            xobject = xobjects.get(operands[0]) if isinstance(operands[0], NameObject) else None
+            image = xobject is not None and xobject.get_object().get("/Subtype") == "/Image"
+            # An image fills the unit square of the current matrix, forms are kept whole
+            if not image or inside([(0, 0), (1, 0), (0, 1), (1, 1)], ctm):
+                kept.append((operands, operator))
+        else:
+            kept.append((operands, operator))
+
+    content.operations = kept
+    return content.get_data()
+
+
+def measure(template, as_is, measuring):
+    """Layout of a compiled template from its renderings as is and with marker rows, or None when it cannot be overlaid."""
+    from pypdf import PdfReader
+    from reportlab.pdfbase.pdfmetrics import stringWidth
+
+    doc = template.document
+    body = doc.element.body
+    page = PdfReader(BytesIO(as_is)).pages[0]
+    width, height = float(page.mediabox.width), float(page.mediabox.height)
+    section = doc.sections[0]
+    top_margin = section.top_margin.pt if section.top_margin is not None else DEFAULT_MARGIN
+    bottom = section.bottom_margin.pt if section.bottom_margin is not None else DEFAULT_MARGIN
+    page_left = section.left_margin.pt if section.left_margin is not None else DEFAULT_MARGIN
+    page_right = width - (section.right_margin.pt if section.right_margin is not None else DEFAULT_MARGIN)
+
+    # Customer rows: the two marker rows give the first row, the pitch and the column edges
+    cells = template.prototype_row.tc_lst
+    lines = text_lines(measuring)
+    first = [locate(lines, MARKER.format(row="A", column=c)) for c in range(len(cells))]
+    second = locate(lines, MARKER.format(row="B", column=0))
+    if None in first or second is None:
+        return None
+    if lines[first[0][0]][0] != 0 or lines[second[0]][0] != 0:
+        # Only a customer table on the first page is supported
+        return None
+
+    first_y = lines[first[0][0]][1]
+    pitch = first_y - lines[second[0]][1]
+    if pitch <= 0:
+        return None
+    lefts = [x - CELL_PADDING for _, _, x in first]
+    last_width = cells[-1].width
+    last_right = lefts[-1] + last_width.pt if last_width is not None else page_right
+    rights = lefts[1:] + [last_right]
+
+    # Placeholder paragraphs, found in document order on the template as is
+    lines = text_lines(as_is)
+    paragraphs = []
+    position = (0, 0)
+    for indices in template.placeholders:
+        paragraph = Paragraph(resolve_path(body, indices), doc)
+        text = paragraph_text(paragraph._p)
+        found = locate(lines, text, position)
+        if found is None:
+            return None
+        line_index, char_index, x = found
+        number, y, size, _ = lines[line_index]
+        align = alignment_name(paragraph)
+        left, right = text_frame(paragraph._p, x, stringWidth(text.strip(), FONT, size), align, page_left, page_right)
+        paragraphs.append({
+            "page": number, "y": y, "lines": line_positions(lines, text, found), "size": size,
+            "text": text, "align": align, "left": left, "right": right,
+        })
+        position = (line_index, char_index + 1)
+
+    # The content between the table and the bottom margin moves down below the rows
+    table_bottom = first_y + pitch * BASELINE_RATIO
+    below = [y - size * DESCENT_RATIO for number, y, size, _ in lines if number == 0 and bottom < y < table_bottom]
+
+    return {
+        "width": width, "height": height, "top": height - top_margin, "bottom": bottom,
+        "columns": list(zip(lefts, rights)), "pitch": pitch, "table_bottom": table_bottom,
+        "tail_low": max(bottom, min(below)) if below else table_bottom,
+        "grid": table_has_grid(resolve_path(body, template.table_path)),
+        "pages": len(PdfReader(BytesIO(as_is)).pages),
+        "paragraphs": paragraphs,
+    }
+
+
+def blank_paragraph(paragraph, lines):
+    """Empties a paragraph, line breaks in its first run keeping the number of lines it takes."""
+    for t in paragraph._p.iter(TEXT_TAG):
+        t.text = ""
+    if lines > 1:
+        run = paragraph.runs[0] if paragraph.runs else paragraph.add_run()
+        run.text = "\n" * (lines - 1)
+
+
+def render_documents(**documents):
+    """PDFs of python-docx documents by name, made by the current renderer."""
+    renderer = get_renderer()
+    rendered = {}
+    with job_workspace() as workspace:
+        for name, document in documents.items():
+            docx_path = path.join(workspace, f"{name}.docx")
+            pdf_path = path.join(workspace, f"{name}.pdf")
+            document.save(docx_path)
+            renderer.convert(docx_path, pdf_path)
+            with open(pdf_path, "rb") as f:
+                rendered[name] = f.read()
+    return rendered
+
+
+def render_template(template):
+    """(background PDF, layout) of a compiled template, or None when it cannot be overlaid."""
+    as_is, _, _ = template.clone()
+    measuring, table, _ = template.clone()
+    columns = len(template.prototype_row.tc_lst)
+    builder = RowBuilder(template.prototype_row, (None,) * columns, Pt(ROW_FONT_SIZE))
+    builder.fill(table, [tuple(MARKER.format(row=row, column=c) for c in range(columns)) for row in "AB"])
+
+    rendered = render_documents(as_is=as_is, measuring=measuring)
+    layout = measure(template, rendered["as_is"], rendered["measuring"])
+    if layout is None:
+        return None
+
+    # The placeholder text is left out of the background, not hidden: it would be in the invoice's text layer
+    background, _, paragraphs = template.clone()
+    for paragraph, measured in zip(paragraphs, layout["paragraphs"]):
+        blank_paragraph(paragraph, len(measured["lines"]))
+    return render_documents(background=background)["background"], layout
+
+
+class TemplateOverlay:
+    """A measured template background; render() writes an invoice PDF from it."""
+
+    def __init__(self, layout, background):
+        self.layout = layout
+        self.background = background
+        # band_content() of every band used so far, by (template page, bottom, top)
+        self.bands = {}
+
+    def band(self, y):
+        """Where a paragraph of the first template page sits: header, footer, head or tail."""
+        if y > self.layout["top"]:
+            return "header"
+        if y < self.layout["bottom"]:
+            return "footer"
+        return "head" if y >= self.layout["table_bottom"] else "tail"
+
+    def band_data(self, template_page, y0, y1):
+        """band_content() of a band of the background, worked out once."""
+        from pypdf import PdfReader
+
+        key = (template_page, y0, y1)
+        if key not in self.bands:
+            self.bands[key] = band_content(PdfReader(BytesIO(self.background)).pages[template_page], y0, y1)
+        return self.bands[key]
+
+    def render(self, replacements, rows, alignments, pdf_path):
+        """Draws the invoice: filled paragraphs, rows (tuples of cell texts) and the background bands.
+
+        Returns False, without writing pdf_path, when some text does not fit the template layout.
+        """
+        from pypdf import PdfReader, PdfWriter, Transformation
+        from pypdf.generic import DecodedStreamObject, NameObject, RectangleObject
+        from reportlab.pdfgen.canvas import Canvas
+
+        layout = self.layout
+        width, height = layout["width"], layout["height"]
+        top, bottom, pitch = layout["top"], layout["bottom"], layout["pitch"]
+        table_bottom, tail_low = layout["table_bottom"], layout["tail_low"]
+        leading = ROW_FONT_SIZE * LINE_SPACING
+
+        # Filled paragraphs have to fit the lines the template gave them, nothing below moves
+        pattern = compile_placeholders(replacements) if replacements else None
+        texts = []
+        for p in layout["paragraphs"]:
+            text = pattern.sub(lambda match: replacements[match.group(0)], p["text"]) if pattern else p["text"]
+            lines = wrap(text.strip(), p["right"] - p["left"], p["size"])
+            if len(lines) > len(p["lines"]):
+                return False
+            texts.append(lines)
+
+        overlay = BytesIO()
+        canvas = Canvas(overlay, pagesize=(width, height))
+        # Background bands of every output page: (template page, bottom, top, shift)
+        pages = [[(0, table_bottom, height, 0), (0, 0, bottom, 0)]]
+
+        def draw_paragraphs(page, bands, shift=0):
+            for p, lines in zip(layout["paragraphs"], texts):
+                if p["page"] != page or (bands and self.band(p["y"]) not in bands):
+                    continue
+                canvas.setFont(FONT, p["size"])
+                for y, text in zip(p["lines"], lines):
+                    if p["align"] == "right":
+                        canvas.drawRightString(p["right"], y + shift, text)
+                    elif p["align"] == "center":
+                        canvas.drawCentredString((p["left"] + p["right"]) / 2, y + shift, text)
+                    else:
+                        canvas.drawString(p["left"], y + shift, text)
+
+        def new_page():
+            canvas.showPage()
+            pages.append([(0, top, height, 0), (0, 0, bottom, 0)])
+            draw_paragraphs(0, ("header", "footer"))
+            return top
+
+        draw_paragraphs(0, ("header", "head", "footer"))
+
+        # Customer rows
+        row_top = table_bottom
+        canvas.setLineWidth(GRID_WIDTH)
+        for values in rows:
+            cells = [wrap(value, x1 - x0 - 2 * CELL_PADDING, ROW_FONT_SIZE)
+                     for (x0, x1), value in zip(layout["columns"], values)]
+            # Every line past the first makes the row taller
+            row_height = pitch + (max(map(len, cells), default=1) - 1) * leading
+            if row_height > top - bottom:
+                return False
+            if row_top - row_height < bottom:
+                row_top = new_page()
+            canvas.setFont(FONT, ROW_FONT_SIZE)
+            for (x0, x1), lines, alignment in zip(layout["columns"], cells, alignments):
+                baseline = row_top - pitch * BASELINE_RATIO
+                for text in lines:
+                    if alignment == WD_ALIGN_PARAGRAPH.RIGHT:
+                        canvas.drawRightString(x1 - CELL_PADDING, baseline, text)
+                    elif alignment == WD_ALIGN_PARAGRAPH.CENTER:
+                        canvas.drawCentredString((x0 + x1) / 2, baseline, text)
+                    else:
+                        canvas.drawString(x0 + CELL_PADDING, baseline, text)
+                    baseline -= leading
+            if layout["grid"]:
+                left, right = layout["columns"][0][0], layout["columns"][-1][1]
+                canvas.line(left, row_top, right, row_top)
+                canvas.line(left, row_top - row_height, right, row_top - row_height)
+                for x in [x0 for x0, _ in layout["columns"]] + [right]:
+                    canvas.line(x, row_top, x, row_top - row_height)
+            row_top -= row_height
+
+        # What followed the table, below the last row or at the top of a new page
+        if row_top - (table_bottom - tail_low) < bottom:
+            row_top = new_page()
+        shift = row_top - table_bottom
+        if tail_low < table_bottom:
+            pages[-1].append((0, tail_low, table_bottom, shift))
+        draw_paragraphs(0, ("tail",), shift)
+
+        # Further template pages as they are
+        for page in range(1, layout["pages"]):
+            canvas.showPage()
+            pages.append([(page, 0, height, 0)])
+            draw_paragraphs(page, ())
+        canvas.save()
+
+        background = PdfReader(BytesIO(self.background))
+        drawn = PdfReader(overlay)
+        writer = PdfWriter()
+        for number, bands in enumerate(pages):
+            page = writer.add_blank_page(width, height)
+            for template_page, y0, y1, shift in bands:
+                source = background.pages[template_page]
+                if y0 > 0 or y1 < height:
+                    contents = DecodedStreamObject()
+                    contents.set_data(self.band_data(template_page, y0, y1))
+                    source[NameObject("/Contents")] = contents
+                # The merge is clipped to the source page's box: cut the band out with it
+                source.cropbox = source.trimbox = RectangleObject((0, y0, width, y1))
+                page.merge_transformed_page(source, Transformation().translate(0, shift))
+            page.merge_page(drawn.pages[number])
+        writer.write(pdf_path)
+        return True
+
+
+def cache_paths(template_path):
+    digest = sha1(f"{OVERLAY_VERSION}|{file_digest(template_path)}".encode()).hexdigest()
+    base = path.join(resource_path(CACHE_DIR), f"overlay-{digest}")
+    return base + ".pdf", base + ".json"
+
+
+def template_overlay(template):
+    """TemplateOverlay of a compiled template (rendered once, then cached), or None
+    when the template cannot be overlaid or rendered."""
+    cached = overlays.get(template.path)
+    if cached is not None and cached[0] == template.mtime:
+        return cached[1]
+
+    background_path, layout_path = cache_paths(template.path)
+    try:
+        with open(background_path, "rb") as f:
+            background = f.read()
+        with open(layout_path, encoding="utf-8") as f:
+            layout = json.load(f)
+    except (OSError, ValueError):
+        try:
+            background, layout = render_template(template) or (None, None)
+        except Exception as e:
+            print(f"Template overlay unavailable, using the regular renderer: {e}")
+            layout = None
+
+        if layout is None:
+            overlays[template.path] = (template.mtime, None)
+            return None
+        try:
+            os.makedirs(path.dirname(background_path), exist_ok=True)
+            # Written under temporary names first, other processes may be reading the cache
+            temp_suffix = f".{os.getpid()}.tmp"
+            with open(background_path + temp_suffix, "wb") as f:
+                f.write(background)
+            with open(layout_path + temp_suffix, "w", encoding="utf-8") as f:
+                json.dump(layout, f)
+            os.replace(background_path + temp_suffix, background_path)
+            os.replace(layout_path + temp_suffix, layout_path)
+        except OSError:
+            pass
+
+    overlay = TemplateOverlay(layout, background)
+    overlays[template.path] = (template.mtime, overlay)
+    return overlay
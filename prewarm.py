@@ -0,0 +1,83 @@
+"""Heavy imports in the background while the bank picker is shown.
+
+The bank windows need pandas, numpy, python-docx, num2words and the spreadsheet
+readers, and importing them took seconds (more in the frozen exe) right after
+"Load Data" was clicked. MainApp starts a thread importing them as soon as the
+picker shows, so they are usually loaded by the time a file is chosen. An
+import still running when "Load Data" is clicked simply finishes first, Python
+lets only one thread import a module.
+
+The time spent in each import is printed once the thread is done
+(INVOICE_STARTUP_REPORT=0 turns the report off). Times are in import order, a
+dependency shared by several modules counts for the first one that needs it.
+"""
+import os
+from importlib import import_module
+from threading import Thread
+from time import perf_counter
+from renderers import renderer_name
+
+REPORT_ENV = "INVOICE_STARTUP_REPORT"
+
+# Third-party packages first (the slow part), then the app's own modules
+MODULES = (
+    "numpy", "pandas", "lxml.etree", "docx", "num2words", "python_calamine", "openpyxl",
+    "ingestion", "banks", "invoice", "background_loader", "virtual_table",
+    "bank_window", "adib_module", "dib_module", "cbd_module", "mashreq_module",
+)
+# Only needed by some setups, warmed when they are the ones in use
+OVERLAY_MODULES = ("pypdf", "reportlab.pdfgen.canvas")
+WORD_MODULES = ("docx2pdf",)
+
+import_times = []
+prewarm_thread = None
+
+
+def optional_modules():
+    # pdf_overlay is already loaded by invoice at this point
+    from pdf_overlay import overlay_enabled
+
+    modules = ()
+    if overlay_enabled():
+        modules += OVERLAY_MODULES
+    if renderer_name() == "docx2pdf":
+        modules += WORD_MODULES
+    return modules
+
+
+def import_timed(name):
+    start = perf_counter()
+    try:
+        import_module(name)
+    except Exception:
+        # Not installed (optional reader), or broken: the real import reports it when needed
+        return None
+    return perf_counter() - start
+
+
+def warm():
+    start = perf_counter()
+    for name in MODULES:
+        import_times.append((name, import_timed(name)))
+    for name in optional_modules():
+        import_times.append((name, import_timed(name)))
+    import_times.append(("total", perf_counter() - start))
+
+    if os.environ.get(REPORT_ENV, "1") != "0":
+        print(startup_report())
+
+
+def startup_report():
+    lines = ["Startup imports (in the background):"]
+    for name, seconds in import_times:
+        lines.append(f"  {name:<26}" + ("not available" if seconds is None else f"{seconds:6.2f}s"))
+    return "\n".join(lines) + "\n"
+
+
+def start_prewarm():
+    """Starts importing the heavy modules on a daemon thread, once per process."""
+    global prewarm_thread
+    if prewarm_thread is None:
+        prewarm_thread = Thread(target=warm, name="prewarm", daemon=True)
+        prewarm_thread.start()
+    return prewarm_thread
@@ -0,0 +1,166 @@
+"""On-demand profiling of one load or invoice, for slow cases from the field.
+
+Off by default. INVOICE_PROFILE=1 profiles every workbook load and invoice, and
+Ctrl+Shift+P on a bank window (not shown anywhere) profiles the next "Create
+Invoice" only. The work is run under cProfile and tracemalloc, and next to the
+saved PDF go:
+
+- <invoice>-profile-invoice.pstats and <invoice>-profile-load.pstats, for
+  python -m pstats or snakeviz;
+- <invoice>-profile-invoice.txt and <invoice>-profile-load.txt, the slowest
+  functions and the lines holding the most memory at the end of the run.
+
+A load that ends without an invoice is written next to its workbook instead.
+Loads are profiled on the loader thread (reading and calculations); filling the
+table on the Tk thread is in the "table" stage of timings.py. With
+INVOICE_TIMINGS on as well, every timed stage resets the traced peak, so the
+peak reported here is the one of the last stage.
+"""
+import cProfile
+import io
+import os
+import pstats
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+from os import path
+from time import perf_counter
+
+PROFILE_ENV = "INVOICE_PROFILE"
+# Tk reports Ctrl+Shift+P as Control with an upper case P
+PROFILE_KEY = "<Control-P>"
+# Functions and allocation sites listed in the .txt report
+TOP = 30
+TRACE_FRAMES = 10
+MB = 1024 * 1024
+
+
+def profile_enabled():
+    return os.environ.get(PROFILE_ENV, "0") not in ("", "0")
+
+
+class Capture:
+    """cProfile and tracemalloc over the blocks of one load or invoice."""
+
+    def __init__(self, kind):
+        self.kind = kind
+        self.profile = cProfile.Profile()
+        self.started = datetime.now().isoformat(timespec="seconds")
+        self.start = perf_counter()
+        self.seconds = None
+        self.snapshot = None
+        self.peak = 0
+        self.written = False
+
+        self.traces_memory = not tracemalloc.is_tracing()
+        if self.traces_memory:
+            tracemalloc.start(TRACE_FRAMES)
+
+    @contextmanager
+    def profiled(self):
+        """Profiles the block on the calling thread."""
+        try:
+            self.profile.enable()
+        except ValueError:
+            # Another profiler is active (a developer's own), it gets the block instead
+            yield
+            return
+        try:
+            yield
+        finally:
+            self.profile.disable()
+
+    def batches(self, batches):
+        """Wraps a batch generator so that producing every batch is profiled, on whichever thread reads it."""
+        try:
+            while True:
+                with self.profiled():
+                    batch = next(batches, None)
+                if batch is None:
+                    return
+                yield batch
+        finally:
+            batches.close()
+
+    def stop(self):
+        """Ends the capture: keeps the allocations still alive and stops tracemalloc (once)."""
+        if self.seconds is not None:
+            return
+        self.seconds = perf_counter() - self.start
+        if tracemalloc.is_tracing():
+            self.peak = tracemalloc.get_traced_memory()[1]
+            self.snapshot = tracemalloc.take_snapshot()
+        if self.traces_memory:
+            tracemalloc.stop()
+
+    @contextmanager
+    def finishing(self, report_path):
+        """Profiles the last block, then writes the capture next to report_path, even when the block fails."""
+        try:
+            with self.profiled():
+                yield
+        finally:
+            self.stop()
+            self.write(report_path)
+
+    def report(self):
+        lines = [f"Profile of {self.kind} started {self.started}: {self.seconds:.2f}s, "
+                 f"peak traced memory {self.peak / MB:.1f} MB", ""]
+
+        stream = io.StringIO()
+        stats = pstats.Stats(self.profile, stream=stream)
+        stats.sort_stats("cumulative").print_stats(TOP)
+        lines.append(f"Slowest {TOP} functions (cumulative time):")
+        lines.append(stream.getvalue())
+
+        if self.snapshot:
+            lines.append(f"Top {TOP} allocation sites (memory still allocated at the end):")
+            for statistic in self.snapshot.statistics("lineno")[:TOP]:
+                frame = statistic.traceback[0]
+                lines.append(f"  {statistic.size / MB:9.2f} MB {statistic.count:>9} blocks  {frame.filename}:{frame.lineno}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, report_path):
+        """Writes <report_path without extension>-profile-<kind>.pstats and .txt (once)."""
+        if self.written:
+            return
+        self.written = True
+        self.stop()
+
+        base = f"{path.splitext(report_path)[0]}-profile-{self.kind}"
+        # Profiling is only a diagnostic, it never stops an invoice
+        try:
+            self.profile.dump_stats(base + ".pstats")
+            with open(base + ".txt", "w", encoding="utf-8") as f:
+                f.write(self.report())
+        except OSError as e:
+            print(f"Could not write the {self.kind} profile: {e}")
+            return
+        print(f"Profile of the {self.kind} written to {base}.pstats and {base}.txt")
+
+
+class NoCapture:
+    """Stands in for Capture when profiling is off, every call does nothing."""
+
+    def profiled(self):
+        return nullcontext()
+
+    def batches(self, batches):
+        return batches
+
+    def stop(self):
+        pass
+
+    def finishing(self, report_path):
+        return nullcontext()
+
+    def write(self, report_path):
+        pass
+
+
+NO_CAPTURE = NoCapture()
+
+
+def start_capture(kind, requested=False):
+    """Capture of a load or an invoice when requested or INVOICE_PROFILE is set, NO_CAPTURE otherwise."""
+    return Capture(kind) if requested or profile_enabled() else NO_CAPTURE
@@ -0,0 +1,132 @@
+"""Spreadsheet reader backends.
+
+pandas picks openpyxl for .xlsx and odfpy for .ods by default, and odfpy is very
+slow. iter_sheet_rows() tries the fastest installed engine for the file type
+first (calamine, a Rust reader that handles .xlsx, .xls and .ods) and falls back
+to the pure Python engines when it is missing or cannot open the file.
+
+It streams the first sheet row by row instead of building a DataFrame, for the
+chunked ingestion of very large workbooks.
+"""
+from importlib.util import find_spec
+from os import path
+from pandas import read_excel, isna
+
+# Engines per file type, fastest first. pandas already opens openpyxl workbooks read-only.
+BACKENDS = {
+    ".xlsx": ("calamine", "openpyxl"),
+    ".xlsm": ("calamine", "openpyxl"),
+    ".xls": ("calamine", "xlrd"),
+    ".xlsb": ("calamine", "pyxlsb"),
+    ".ods": ("calamine", "odf"),
+}
+
+ENGINE_MODULES = {
+    "calamine": "python_calamine",
+    "openpyxl": "openpyxl",
+    "xlrd": "xlrd",
+    "pyxlsb": "pyxlsb",
+    "odf": "odf",
+}
+
+# Above this size .xlsx files are streamed with openpyxl's read-only parser, which keeps
+# only the current row in memory. calamine is faster but holds the whole sheet natively.
+STREAMING_FILE_SIZE = 20 * 1024 * 1024
+
+# Backend of the most recent iter_sheet_rows() call, and the sheet's row count as
+# reported by that backend (None when unknown)
+last_read = {"backend": None, "total_rows": None}
+
+
+def available_backends(excel_file_path):
+    """Installed engines that can read this file, fastest first."""
+    extension = path.splitext(excel_file_path)[1].lower()
+    engines = BACKENDS.get(extension, ("calamine", "openpyxl"))
+    return [engine for engine in engines if find_spec(ENGINE_MODULES[engine]) is not None]
+
+
+def open_calamine_rows(excel_file_path):
+    from python_calamine import CalamineWorkbook
+
+    sheet = CalamineWorkbook.from_path(excel_file_path).get_sheet_by_index(0)
+    first_row, first_column = sheet.start if sheet.start else (0, 0)
+    last_read["total_rows"] = first_row + sheet.height
+
+    def rows():
+        # calamine starts at the first used cell, pad so positions match the sheet
+        for _ in range(first_row):
+            yield ()
+        padding = (None,) * first_column
+        for row in sheet.iter_rows():
+            yield padding + tuple(None if value == "" else value for value in row)
+
+    return rows()
+
+
+def open_openpyxl_rows(excel_file_path):
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(excel_file_path, read_only=True, data_only=True)
+    # Taken from the sheet's dimension record, which some writers leave out
+    last_read["total_rows"] = workbook.worksheets[0].max_row
+
+    def rows():
+        try:
+            yield from workbook.worksheets[0].iter_rows(values_only=True)
+        finally:
+            workbook.close()
+
+    return rows()
+
+
+def open_pandas_rows(excel_file_path, engine):
+    # Engines without a streaming API (odfpy, xlrd...) have to load the sheet first
+    sheet = read_excel(excel_file_path, engine=engine, header=None)
+    last_read["total_rows"] = len(sheet)
+
+    def rows():
+        for values in sheet.itertuples(index=False, name=None):
+            yield tuple(None if isna(value) else value for value in values)
+
+    return rows()
+
+
+def iter_sheet_rows(excel_file_path):
+    """Returns an iterator over the rows of the first sheet as tuples of raw cell values (None when empty)."""
+    engines = available_backends(excel_file_path)
+    if not engines:
+        raise ImportError(f"No spreadsheet reader installed for {path.basename(excel_file_path)}")
+
+    if "openpyxl" in engines and path.getsize(excel_file_path) > STREAMING_FILE_SIZE:
+        engines.remove("openpyxl")
+        engines.insert(0, "openpyxl")
+
+    error = None
+    last_read["total_rows"] = None
+    for engine in engines:
+        try:
+            if engine == "calamine":
+                rows = open_calamine_rows(excel_file_path)
+            elif engine == "openpyxl":
+                rows = open_openpyxl_rows(excel_file_path)
+            else:
+                rows = open_pandas_rows(excel_file_path, engine)
+        except FileNotFoundError:
+            raise
+        except Exception as e:
+            error = e
+            continue
+
+        last_read["backend"] = engine
+        return rows
+
+    raise error
+
+
+def cell_text(value):
+    """Text of a raw cell the way read_excel(dtype=str) renders it."""
+    if value is None:
+        return None
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
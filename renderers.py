@@ -0,0 +1,340 @@
+"""DOCX -> PDF renderers behind create_invoice.
+
+docx2pdf drives Microsoft Word, so it only works on Windows/macOS with Word
+installed and starts a conversion session for every invoice. The LibreOffice
+renderer keeps a small pool of warm headless workers instead:
+
+- every worker is a long running unoserver process (one soffice kept loaded)
+  and a conversion is a request to it, so it only costs the render time.
+  unoserver is installed with the requirements on Linux; its server needs a
+  Python with LibreOffice's uno module (python3-uno on most distributions);
+- without unoserver, or when its server cannot start, every worker is a
+  soffice --convert-to run with its own pinned user profile. The profile is only
+  created on the first conversion, but each run still starts LibreOffice.
+
+Profiles are named after the process id and ports are free ones picked when a
+worker starts, so any number of workers and of processes (batch runs, two
+sessions) can run side by side. A worker whose process died is replaced before
+its next conversion.
+
+get_renderer() returns the renderer chosen by the INVOICE_RENDERER environment
+variable ("docx2pdf" or "libreoffice"), docx2pdf on Windows/macOS and
+LibreOffice elsewhere by default. It is kept for the life of the process so the
+pool stays warm between invoices.
+"""
+import atexit
+import itertools
+import os
+import shutil
+import socket
+import subprocess
+import sys
+from contextlib import nullcontext
+from importlib.util import find_spec
+from os import path
+from queue import LifoQueue
+from tempfile import gettempdir
+from threading import Lock, Timer
+from time import monotonic, sleep
+from xmlrpc.client import Error as XmlRpcError
+
+RENDERER_ENV = "INVOICE_RENDERER"
+WORKERS_ENV = "INVOICE_RENDER_WORKERS"
+DEFAULT_WORKERS = 2
+STARTUP_TIMEOUT = 60
+CONVERT_TIMEOUT = 300
+# A free port can be taken by another process before unoserver binds it, it is then started again
+START_ATTEMPTS = 3
+
+SOFFICE_LOCATIONS = (
+    r"C:\Program Files\LibreOffice\program\soffice.exe",
+    "/Applications/LibreOffice.app/Contents/MacOS/soffice",
+)
+
+renderer_lock = Lock()
+current_renderer = None
+# Word runs once per machine, batch worker processes share this lock so their conversions take turns
+word_lock = None
+# Worker numbers and ports handed out in this process
+worker_lock = Lock()
+worker_numbers = itertools.count()
+used_ports = set()
+
+
+class Renderer:
+    """Converts a .docx file on disk to a PDF."""
+
+    name = None
+
+    def convert(self, docx_path, pdf_path):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class Docx2PdfRenderer(Renderer):
+    name = "docx2pdf"
+
+    def convert(self, docx_path, pdf_path):
+        from docx2pdf import convert
+        with word_lock or nullcontext():
+            convert(docx_path, pdf_path)
+
+
+def find_soffice():
+    for name in ("soffice", "libreoffice"):
+        found = shutil.which(name)
+        if found:
+            return found
+    for location in SOFFICE_LOCATIONS:
+        if path.exists(location):
+            return location
+    return None
+
+
+def worker_profile(kind):
+    """A user profile directory no other worker, in this process or another, uses."""
+    with worker_lock:
+        number = next(worker_numbers)
+    return path.join(gettempdir(), f"invoice-{kind}-{os.getpid()}-{number}")
+
+
+def free_port():
+    """A port nothing listens on, never the same one twice in this process."""
+    with worker_lock:
+        while True:
+            with socket.socket() as probe:
+                probe.bind(("127.0.0.1", 0))
+                port = probe.getsockname()[1]
+            if port not in used_ports:
+                used_ports.add(port)
+                return port
+
+
+def profile_url(profile_dir):
+    """file:// URL of a LibreOffice user profile directory."""
+    return "file:///" + path.abspath(profile_dir).replace("\\", "/").lstrip("/")
+
+
+class SofficeWorker:
+    """soffice --convert-to runs sharing one pinned profile, one at a time."""
+
+    def __init__(self, soffice):
+        self.soffice = soffice
+        self.profile = worker_profile("soffice")
+
+    def convert(self, docx_path, pdf_path):
+        out_dir = path.dirname(path.abspath(docx_path))
+        subprocess.run(
+            [self.soffice, f"-env:UserInstallation={profile_url(self.profile)}",
+             "--headless", "--norestore", "--nolockcheck",
+             "--convert-to", "pdf", "--outdir", out_dir, docx_path],
+            check=True, capture_output=True, timeout=CONVERT_TIMEOUT,
+        )
+        rendered = path.join(out_dir, path.splitext(path.basename(docx_path))[0] + ".pdf")
+        if not path.exists(rendered):
+            raise RuntimeError(f"LibreOffice did not produce {path.basename(rendered)}")
+        shutil.move(rendered, pdf_path)
+
+    def alive(self):
+        return True
+
+    def close(self):
+        shutil.rmtree(self.profile, ignore_errors=True)
+
+
+class UnoserverWorker:
+    """One unoserver process (a resident soffice) serving conversions on its own port."""
+
+    def __init__(self, soffice):
+        self.profile = worker_profile("unoserver")
+        for attempt in range(START_ATTEMPTS):
+            self.port = free_port()
+            # The server runs under the Python that has LibreOffice's uno module, not necessarily ours
+            self.process = subprocess.Popen(
+                [shutil.which("unoserver"), "--interface", "127.0.0.1",
+                 "--port", str(self.port), "--uno-port", str(free_port()),
+                 "--executable", soffice, "--user-installation", self.profile],
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+            )
+            try:
+                self.wait_until_ready()
+                break
+            except RuntimeError:
+                if attempt == START_ATTEMPTS - 1:
+                    raise
+
+        from unoserver.client import UnoClient
+        self.client = UnoClient("127.0.0.1", str(self.port))
+
+    def wait_until_ready(self):
+        deadline = monotonic() + STARTUP_TIMEOUT
+        while monotonic() < deadline:
+            if not self.alive():
+                self.close()
+                raise RuntimeError("unoserver exited while starting")
+            try:
+                with socket.create_connection(("127.0.0.1", self.port), timeout=1):
+                    return
+            except OSError:
+                sleep(0.2)
+        self.close()
+        raise RuntimeError("unoserver did not start in time")
+
+    def convert(self, docx_path, pdf_path):
+        # UnoClient waits forever: past CONVERT_TIMEOUT the server is stopped, which ends the request
+        self.expired = False
+        timer = Timer(CONVERT_TIMEOUT, self.expire)
+        timer.start()
+        try:
+            self.client.convert(inpath=path.abspath(docx_path), outpath=path.abspath(pdf_path), convert_to="pdf")
+        except (OSError, XmlRpcError):
+            if self.expired:
+                raise subprocess.TimeoutExpired("unoserver", CONVERT_TIMEOUT) from None
+            raise
+        finally:
+            timer.cancel()
+
+    def expire(self):
+        self.expired = True
+        self.close()
+
+    def alive(self):
+        return self.process.poll() is None
+
+    def close(self):
+        if self.alive():
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+        shutil.rmtree(self.profile, ignore_errors=True)
+
+
+def unoserver_available():
+    return shutil.which("unoserver") is not None and find_spec("unoserver") is not None
+
+
+class LibreOfficeRenderer(Renderer):
+    """Pool of warm LibreOffice workers; convert() blocks until one is free."""
+
+    name = "libreoffice"
+
+    def __init__(self, workers=None):
+        self.soffice = find_soffice()
+        if not self.soffice:
+            raise RuntimeError("LibreOffice (soffice) was not found. Install it or set INVOICE_RENDERER=docx2pdf.")
+
+        self.size = workers or int(os.environ.get(WORKERS_ENV, DEFAULT_WORKERS))
+        self.worker_class = UnoserverWorker if unoserver_available() else SofficeWorker
+        self.workers = []
+        self.lock = Lock()
+        # Idle workers, the last one back on top so the warm ones are reused first. None is
+        # a free slot of the pool: workers are started lazily, only when all are busy
+        self.idle = LifoQueue()
+        for _ in range(self.size):
+            self.idle.put(None)
+
+    def acquire(self):
+        worker = self.idle.get()
+        if worker is not None and worker.alive():
+            return worker
+        try:
+            if worker is not None:
+                self.discard(worker)
+            worker = self.start_worker()
+        except BaseException:
+            self.idle.put(None)
+            raise
+        with self.lock:
+            self.workers.append(worker)
+        return worker
+
+    def start_worker(self):
+        try:
+            return self.worker_class(self.soffice)
+        except RuntimeError as e:
+            if self.worker_class is not UnoserverWorker:
+                raise
+            # Most likely no Python with the uno module for the server, the pool goes on with soffice runs
+            print(f"unoserver could not start ({e}), converting with soffice --convert-to")
+            self.worker_class = SofficeWorker
+            return SofficeWorker(self.soffice)
+
+    def discard(self, worker):
+        with self.lock:
+            if worker in self.workers:
+                self.workers.remove(worker)
+        worker.close()
+
+    def release(self, worker):
+        # A worker whose process died gives its slot back rather than being reused
+        if not worker.alive():
+            self.discard(worker)
+            worker = None
+        self.idle.put(worker)
+
+    def convert(self, docx_path, pdf_path):
+        worker = self.acquire()
+        try:
+            worker.convert(docx_path, pdf_path)
+        except subprocess.CalledProcessError as e:
+            message = (e.stderr or b"").decode(errors="replace").strip()
+            raise RuntimeError(f"PDF conversion failed: {message or e}") from None
+        except (subprocess.SubprocessError, OSError, XmlRpcError) as e:
+            # Timeouts, a soffice that cannot be run, unoserver gone or refusing the file
+            raise RuntimeError(f"PDF conversion failed: {type(e).__name__}: {e}") from None
+        finally:
+            self.release(worker)
+
+    def close(self):
+        with self.lock:
+            workers, self.workers = self.workers, []
+        for worker in workers:
+            worker.close()
+
+
+RENDERERS = {
+    Docx2PdfRenderer.name: Docx2PdfRenderer,
+    LibreOfficeRenderer.name: LibreOfficeRenderer,
+}
+
+
+def default_renderer_name():
+    # docx2pdf needs Microsoft Word, which only exists on Windows and macOS
+    if sys.platform in ("win32", "darwin"):
+        return Docx2PdfRenderer.name
+    return LibreOfficeRenderer.name
+
+
+def renderer_name():
+    """Name of the renderer get_renderer() uses, without creating it."""
+    return os.environ.get(RENDERER_ENV) or default_renderer_name()
+
+
+def get_renderer(name=None):
+    """The process wide renderer, created on first use."""
+    global current_renderer
+    name = name or renderer_name()
+    if name not in RENDERERS:
+        raise ValueError(f"Unknown renderer {name!r}, expected one of: {', '.join(RENDERERS)}")
+
+    with renderer_lock:
+        if current_renderer is None or current_renderer.name != name:
+            if current_renderer is not None:
+                current_renderer.close()
+            current_renderer = RENDERERS[name]()
+        return current_renderer
+
+
+def close_renderer():
+    global current_renderer
+    with renderer_lock:
+        if current_renderer is not None:
+            current_renderer.close()
+            current_renderer = None
+
+
+atexit.register(close_renderer)
@@ -0,0 +1,138 @@
+"""Typed, array-backed store of the invoice rows of a bank window.
+
+The Treeview used to be the only copy of the rows, so create_invoice had to fetch
+every row back with one Tcl call and re-parse the formatted strings. InvoiceRows
+owns the data instead: money as integer cents and the payment slab in millionths
+of a percent (array('q'), the integers of money.py), identifiers/names as plain
+lists. The Treeview only displays display_row(index) of it.
+"""
+from array import array
+from hashlib import sha1
+import numpy
+import money
+
+# Column kinds of a layout
+TEXT_COLUMN = "text"
+MONEY_COLUMN = "money"
+SLAB_COLUMN = "slab"
+
+
+def to_cents(amount):
+    return int(money.to_cents(amount))
+
+
+def format_cents(cents):
+    """1234567 -> '12,345.67' (same result as IntComma(f"{amount:.2f}"))."""
+    sign = "-" if cents < 0 else ""
+    cents = abs(cents)
+    return f"{sign}{cents // 100:,}.{cents % 100:02d}"
+
+
+class InvoiceRows:
+    """Rows of one invoice, laid out in the column order of the bank's table.
+
+    layout is a sequence of (kind, name) pairs, e.g. (TEXT_COLUMN, "customer name"),
+    (MONEY_COLUMN, "loan amount") or (SLAB_COLUMN, "payment slab").
+    slab_format formats the payment slab percentage for display, e.g. "{:.2f}%".
+    """
+
+    def __init__(self, layout, slab_format="{:g}%"):
+        self.layout = tuple(layout)
+        self.slab_format = slab_format
+        self.texts = {name: [] for kind, name in self.layout if kind == TEXT_COLUMN}
+        self.cents = {name: array('q') for kind, name in self.layout if kind == MONEY_COLUMN}
+        self.slabs = array('q')
+
+    def __len__(self):
+        return len(self.slabs)
+
+    def clear(self):
+        for values in self.texts.values():
+            del values[:]
+        for values in self.cents.values():
+            del values[:]
+        del self.slabs[:]
+
+    def extend(self, texts, cents, slabs):
+        """Appends a batch of rows.
+
+        texts maps each text column to an iterable of strings (or a single string
+        repeated for every row), cents maps each money column to its amounts in
+        cents and slabs holds the payment slabs in millionths of a percent (see
+        money.py).
+        """
+        slab_values = numpy.asarray(slabs, dtype=numpy.int64)
+        count = len(slab_values)
+
+        for name, values in texts.items():
+            if isinstance(values, str):
+                self.texts[name].extend([values] * count)
+            else:
+                self.texts[name].extend(values)
+
+        for name, values in cents.items():
+            self.cents[name].frombytes(numpy.asarray(values, dtype=numpy.int64).tobytes())
+
+        self.slabs.frombytes(slab_values.tobytes())
+
+    def text(self, name, index):
+        return self.texts[name][index]
+
+    def amount(self, name, index):
+        """Amount in cents."""
+        return self.cents[name][index]
+
+    def slab(self, index):
+        """Payment slab as a percentage."""
+        return self.slabs[index] / money.SLAB_SCALE
+
+    def slab_units(self, index):
+        """Payment slab in millionths of a percent."""
+        return self.slabs[index]
+
+    def set_text(self, name, index, value):
+        self.texts[name][index] = value
+
+    def set_amount(self, name, index, amount):
+        self.cents[name][index] = to_cents(amount)
+
+    def set_cents(self, name, index, cents):
+        self.cents[name][index] = int(cents)
+
+    def set_slab(self, index, percentage):
+        self.slabs[index] = int(money.to_slabs(percentage))
+
+    def total(self, name):
+        """Sum of a money column in cents, in one call."""
+        # A view of the array, let go right away (an array with a view cannot grow)
+        return money.total(numpy.frombuffer(self.cents[name], dtype=numpy.int64))
+
+    def format_slab(self, index):
+        return self.slab_format.format(self.slab(index))
+
+    def display_row(self, index):
+        """Formatted values of a row, in layout order."""
+        values = []
+        for kind, name in self.layout:
+            if kind == TEXT_COLUMN:
+                values.append(self.texts[name][index])
+            elif kind == MONEY_COLUMN:
+                values.append(format_cents(self.cents[name][index]))
+            else:
+                values.append(self.format_slab(index))
+        return tuple(values)
+
+    def digest(self):
+        """SHA-1 of the rows and their layout, identifies what an invoice is rendered from."""
+        digest = sha1(repr((self.layout, self.slab_format)).encode())
+        for kind, name in self.layout:
+            if kind == TEXT_COLUMN:
+                digest.update("\x1f".join(map(str, self.texts[name])).encode() + b"\x1e")
+            elif kind == MONEY_COLUMN:
+                digest.update(self.cents[name].tobytes())
+        digest.update(self.slabs.tobytes())
+        return digest.hexdigest()
+
+    def column(self, column_index):
+        """(kind, name) of the column at a display position."""
+        return self.layout[column_index]
@@ -0,0 +1,124 @@
+"""Cache of cleaned workbook rows, stored as compressed .npz sidecar files.
+
+Operators often reload the same workbook several times while fixing the invoice
+number or month. The cleaned, typed columns of a load are saved under a key made
+of the bank, the requested columns and the SHA-1 of the workbook contents, so a
+reload of an unchanged file skips reading/cleaning entirely.
+
+Old entries are evicted by age (MAX_AGE_DAYS) and total size (MAX_CACHE_BYTES),
+least recently used first. INVOICE_SIDECAR_CACHE=0 turns the cache off.
+"""
+from hashlib import sha1
+from time import time
+import os
+from os import path
+import numpy
+from pandas import DataFrame
+# Imported as a module, ingestion imports this one too
+import ingestion
+
+CACHE_DIR = "cache"
+CACHE_ENV = "INVOICE_SIDECAR_CACHE"
+CACHE_VERSION = 1
+MAX_CACHE_BYTES = 200 * 1024 * 1024
+MAX_AGE_DAYS = 30
+# Bigger loads are not cached, collecting them would defeat the streaming reader
+MAX_CACHED_ROWS = 200_000
+
+
+def sidecar_cache_enabled():
+    return os.environ.get(CACHE_ENV, "1") != "0"
+
+
+def file_digest(file_path):
+    digest = sha1()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def cache_key(excel_file_path, bank, columns):
+    spec = ",".join(f"{name}={kind}" for name, kind in columns.items())
+    spec_digest = sha1(f"{CACHE_VERSION}|{spec}".encode()).hexdigest()[:12]
+    return f"{bank}-{file_digest(excel_file_path)}-{spec_digest}"
+
+
+def entry_path(key):
+    return path.join(ingestion.resource_path(CACHE_DIR), f"{key}.npz")
+
+
+def load(key):
+    """Returns the cached DataFrame for key, or None on a miss."""
+    file_path = entry_path(key)
+    try:
+        with numpy.load(file_path, allow_pickle=False) as entry:
+            names = entry["columns"].tolist()
+            data = DataFrame({
+                name: entry[f"c{i}"].tolist() if entry[f"c{i}"].dtype.kind == "U" else entry[f"c{i}"]
+                for i, name in enumerate(names)
+            }, columns=names)
+    except (OSError, KeyError, ValueError):
+        return None
+
+    # Mark as recently used for the eviction order
+    try:
+        os.utime(file_path)
+    except OSError:
+        pass
+    return data
+
+
+def save(key, data):
+    """Stores the cleaned columns of data under key, then evicts old entries."""
+    cache_dir = ingestion.resource_path(CACHE_DIR)
+    arrays = {"columns": numpy.array(list(data.columns), dtype=str)}
+    for i, name in enumerate(data.columns):
+        column = data[name]
+        if column.dtype.kind in "fiu":
+            arrays[f"c{i}"] = column.to_numpy()
+        else:
+            arrays[f"c{i}"] = numpy.array(column.tolist(), dtype=str)
+
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        # Write to a temporary name first so a crash never leaves a half written entry
+        temp_path = entry_path(key) + ".tmp"
+        with open(temp_path, "wb") as f:
+            numpy.savez_compressed(f, **arrays)
+        os.replace(temp_path, entry_path(key))
+    except OSError:
+        return
+
+    evict()
+
+
+def evict(max_bytes=MAX_CACHE_BYTES, max_age_days=MAX_AGE_DAYS, cache_dir=None, suffix=".npz"):
+    """Removes the least recently used entries (files ending in suffix) of cache_dir."""
+    cache_dir = cache_dir or ingestion.resource_path(CACHE_DIR)
+    try:
+        names = [name for name in os.listdir(cache_dir) if name.endswith(suffix)]
+    except OSError:
+        return
+
+    entries = []
+    for name in names:
+        file_path = path.join(cache_dir, name)
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, file_path))
+
+    oldest_allowed = time() - max_age_days * 24 * 60 * 60
+    total = sum(size for _, size, _ in entries)
+
+    # Least recently used first
+    for mtime, size, file_path in sorted(entries):
+        if mtime >= oldest_allowed and total <= max_bytes:
+            break
+        try:
+            os.remove(file_path)
+        except OSError:
+            continue
+        total -= size
@@ -0,0 +1,111 @@
+"""Bulk writer for the customer table of an invoice.
+
+create_invoice used to call add_row() for every row, set every cell's text and
+alignment through python-docx objects, then walk all the runs of the table again
+to set the 10pt font. Here one prototype row is styled once (alignment per
+column, 10pt runs), serialized, and every invoice row is produced by filling
+its text slots; the rows are parsed and appended to the table in a few large
+batches instead of one element at a time, or streamed into the saved file by
+docx_stream. Like cell.text, the slots turn line breaks and tabs into w:br and
+w:tab, and characters XML does not allow are dropped.
+"""
+import re
+from copy import deepcopy
+from xml.sax.saxutils import escape
+from docx.oxml import parse_xml
+from docx.oxml.ns import nsdecls, qn
+from docx.shared import Pt
+from lxml import etree
+
+ROW_TAG = qn('w:tr')
+# Rows parsed per batch, bounds the size of the XML string built at once
+BATCH_ROWS = 5000
+# Stands in for the cell text while the prototype row is serialized (a private use character)
+SLOT = "\ue000"
+# Characters XML 1.0 does not allow, Word refuses a document holding any of them
+INVALID_XML = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f\ud800-\udfff\ufffe\uffff]")
+# Line breaks and tabs become elements of the run, as python-docx's cell.text made them
+RUN_BREAKS = re.compile(r"\r\n|[\r\n\t]")
+BREAK = '</w:t><w:br/><w:t xml:space="preserve">'
+BREAK_XML = {"\r\n": BREAK, "\r": BREAK, "\n": BREAK, "\t": '</w:t><w:tab/><w:t xml:space="preserve">'}
+
+
+def blank_row(tbl):
+    """A detached w:tr shaped like the ones Table.add_row() appends to tbl."""
+    tr = parse_xml(f"<w:tr {nsdecls('w')}/>")
+    for grid_col in tbl.tblGrid.gridCol_lst:
+        tc = tr.add_tc()
+        if grid_col.w is not None:
+            tc.width = grid_col.w
+    return tr
+
+
+def text_xml(value):
+    """Escaped cell text for a w:t slot, invalid characters dropped and breaks made w:br/w:tab."""
+    text = escape(INVALID_XML.sub("", value))
+    return RUN_BREAKS.sub(lambda match: BREAK_XML[match.group(0)], text)
+
+
+def set_font_size(element, size):
+    """Sets the font size of every run below element (what format_table_cells did)."""
+    for r in element.iter(qn('w:r')):
+        r.get_or_add_rPr().get_or_add_sz().val = size
+
+
+class RowBuilder:
+    """Builds customer rows from a prototype row.
+
+    alignments holds one WD_ALIGN_PARAGRAPH value (or None for the default, left)
+    per column; every cell gets a single run in font_size.
+    """
+
+    def __init__(self, prototype, alignments, font_size=Pt(10)):
+        row = deepcopy(prototype)
+        cells = row.tc_lst
+        if len(cells) != len(alignments):
+            raise ValueError(f"Customer table has {len(cells)} columns, expected {len(alignments)}.")
+
+        for tc, alignment in zip(cells, alignments):
+            # Same content as cell.text = ... on a fresh cell
+            tc.clear_content()
+            p = tc.add_p()
+            if alignment is not None:
+                p.get_or_add_pPr().jc_val = alignment
+            r = p.add_r()
+            r.get_or_add_rPr().get_or_add_sz().val = font_size
+            t = r.add_t(SLOT)
+            t.set(qn('xml:space'), 'preserve')
+
+        # The text between the slots is the same for every row. The namespace is
+        # declared by whatever document the rows end up in, not on every row
+        xml = etree.tostring(row, encoding="unicode").replace(" " + nsdecls('w'), "", 1)
+        self.fragments = xml.split(SLOT)
+        self.columns = len(cells)
+        self.font_size = font_size
+
+    def row_xml(self, values):
+        parts = [self.fragments[0]]
+        for value, fragment in zip(values, self.fragments[1:]):
+            parts.append(text_xml(value))
+            parts.append(fragment)
+        return "".join(parts)
+
+    def iter_batches(self, rows):
+        """XML of rows (an iterable of tuples of cell texts), BATCH_ROWS rows per string."""
+        batch = []
+        for values in rows:
+            batch.append(self.row_xml(values))
+            if len(batch) == BATCH_ROWS:
+                yield "".join(batch)
+                batch = []
+        if batch:
+            yield "".join(batch)
+
+    def fill(self, table, rows):
+        """Sets the font of the rows already in a docx Table, then appends rows to it."""
+        tbl = table._tbl
+        set_font_size(tbl, self.font_size)
+        for xml in self.iter_batches(rows):
+            # One parse for the whole batch, the namespace is declared on the wrapper
+            wrapper = parse_xml(f"<w:tbl {nsdecls('w')}>{xml}</w:tbl>")
+            tbl.extend(list(wrapper.iterchildren(ROW_TAG)))
@@ -0,0 +1,133 @@
+"""Placeholder substitution for the bank .docx templates.
+
+create_invoice used to call replace_text() for every paragraph x every
+placeholder, re-joining the runs each time, and did it again for every cell of
+every table, including the customer table after thousands of rows were added.
+
+Now compile_template() parses a template file once (and again only when its
+mtime changes) and locates its customer table, prototype row and the paragraphs
+holding placeholders up front. Every invoice works on an in-memory clone,
+touching only those indexed locations, and all the placeholders are compiled
+into one regular expression so each paragraph is filled in a single pass.
+"""
+import re
+from copy import deepcopy
+from os import path
+from docx import Document
+from docx.oxml.ns import qn
+from docx.table import Table
+from docx.text.paragraph import Paragraph
+from table_builder import blank_row
+
+PARAGRAPH_TAG = qn('w:p')
+TABLE_TAG = qn('w:tbl')
+ROW_TAG = qn('w:tr')
+TEXT_TAG = qn('w:t')
+PLACEHOLDER = re.compile(r"\[[^\[\]]+\]")
+CUSTOMER_TABLE_MARKER = "customer name"
+
+# Compiled templates by absolute path
+compiled_templates = {}
+
+
+def compile_placeholders(replacements):
+    """One pattern matching any of the placeholders, longest first so none shadows another."""
+    keys = sorted(replacements, key=len, reverse=True)
+    return re.compile("|".join(re.escape(key) for key in keys))
+
+
+def paragraph_text(p):
+    return "".join(t.text or "" for t in p.iter(TEXT_TAG))
+
+
+def substitute_paragraph(paragraph, pattern, replacements):
+    """Replaces every placeholder of a paragraph in a single pass. Returns the number replaced."""
+    full = "".join(run.text for run in paragraph.runs) or paragraph.text
+    replaced, count = pattern.subn(lambda match: replacements[match.group(0)], full)
+    if count:
+        # Same as replace_text(): the first run takes the whole text, keeping its formatting
+        if paragraph.runs:
+            paragraph.runs[0].text = replaced
+            for r in paragraph.runs[1:]:
+                r.text = ""
+        else:
+            paragraph.text = replaced
+    return count
+
+
+def fill_placeholders(paragraphs, replacements):
+    """Fills the placeholders of already located paragraphs (see CompiledTemplate.clone())."""
+    if not replacements:
+        return 0
+
+    pattern = compile_placeholders(replacements)
+    return sum(substitute_paragraph(paragraph, pattern, replacements) for paragraph in paragraphs)
+
+
+def element_path(root, element):
+    """Child indices leading from root to element."""
+    indices = []
+    while element is not root:
+        parent = element.getparent()
+        indices.append(parent.index(element))
+        element = parent
+    return tuple(reversed(indices))
+
+
+def resolve_path(root, indices):
+    for i in indices:
+        root = root[i]
+    return root
+
+
+def cell_texts(tr):
+    """Texts of the cells of a w:tr element."""
+    return ["".join(t.text or "" for t in tc.iter(TEXT_TAG)) for tc in tr.iterchildren(qn('w:tc'))]
+
+
+class CompiledTemplate:
+    """A bank template parsed once, with the locations an invoice fills in.
+
+    table_path / prototype_row: the customer table (the one whose first row has a
+    "Customer Name" cell) and an empty row shaped like the ones add_row() appends
+    to it (see table_builder); placeholders: the path of every paragraph that
+    contains one.
+    """
+
+    def __init__(self, template_path):
+        self.path = template_path
+        self.mtime = path.getmtime(template_path)
+        self.document = Document(template_path)
+
+        body = self.document.element.body
+        self.table_path = None
+        self.prototype_row = None
+        for tbl in body.iter(TABLE_TAG):
+            rows = list(tbl.iterchildren(ROW_TAG))
+            if rows and CUSTOMER_TABLE_MARKER in (text.strip().lower() for text in cell_texts(rows[0])):
+                self.table_path = element_path(body, tbl)
+                self.prototype_row = blank_row(tbl)
+                break
+
+        self.placeholders = []
+        for p in body.iter(PARAGRAPH_TAG):
+            if PLACEHOLDER.search(paragraph_text(p)):
+                self.placeholders.append(element_path(body, p))
+
+    def clone(self):
+        """Returns (document, customer table or None, placeholder paragraphs) of a fresh copy."""
+        doc = deepcopy(self.document)
+        body = doc.element.body
+
+        table = Table(resolve_path(body, self.table_path), doc) if self.table_path else None
+        paragraphs = [Paragraph(resolve_path(body, indices), doc) for indices in self.placeholders]
+        return doc, table, paragraphs
+
+
+def compile_template(template_path):
+    """CompiledTemplate for a template file, rebuilt only when the file changed."""
+    key = path.abspath(template_path)
+    template = compiled_templates.get(key)
+    if template is None or template.mtime != path.getmtime(key):
+        template = compiled_templates[key] = CompiledTemplate(key)
+    return template
@@ -0,0 +1,50 @@
+from pandas import DataFrame
+from banks import BANKS, number_to_words
+
+
+def dib_rows(amounts, rate):
+    bank = BANKS["DIB"]
+    batch = bank.calculate(DataFrame({
+        "app id": [f"DIB{i}" for i in range(len(amounts))],
+        "customer name": [f"Customer {i}" for i in range(len(amounts))],
+        "financial amount": amounts,
+        "rate": [rate] * len(amounts),
+    }))
+    rows = bank.new_rows()
+    rows.extend(*bank.row_values(batch))
+    return bank, rows
+
+
+def test_dib_incentive_keeps_the_third_decimal_of_the_rate():
+    # 1.375%, not 1.38%
+    bank, rows = dib_rows([1_000_000, 12_345.67], 0.01375)
+    assert rows.amount("incentive", 0) == 1_375_000
+    assert rows.amount("incentive", 1) == 16_975
+    assert rows.amount("payout", 1) == 16_167
+    assert rows.amount("vat", 1) == 808
+
+
+def test_dib_recalculate_keeps_the_third_decimal_of_the_rate():
+    bank, rows = dib_rows([12_345.67], 0.01375)
+    bank.recalculate(rows, 0)
+    assert rows.amount("payout", 0) == 16_975
+
+
+def test_amount_in_words_reads_the_fils_from_cents():
+    assert number_to_words(330_750) == "Three Thousand, Three Hundred Seven and Fifty Fills Only"
+    assert number_to_words(330_705) == "Three Thousand, Three Hundred Seven and Five Fills Only"
+    assert number_to_words(330_700) == "Three Thousand, Three Hundred Seven and Zero Fills Only"
+
+
+def test_totals_in_words_with_a_trailing_zero_in_the_fils():
+    # 1.25% of 264,600.00 is 3,307.50
+    bank, rows = dib_rows([264_600], 0.0125)
+    assert bank.totals(rows)["[AmtinWords]"] == "Three Thousand, Three Hundred Seven and Fifty Fills Only"
+
+    # CBD adds the 5% VAT: 3,150.00 + 157.50 = 3,307.50
+    cbd = BANKS["CBD"]
+    rows = cbd.new_rows()
+    rows.extend(*cbd.row_values(cbd.calculate(DataFrame({
+        "lmf": ["LMF1"], "customer name": ["Customer"], "booked": [315_000],
+    }))))
+    assert cbd.totals(rows)["[AmtinWords]"] == "Three Thousand, Three Hundred Seven and Fifty Fills Only"
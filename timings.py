@@ -0,0 +1,166 @@
+"""Per-stage timing of workbook loads and invoices.
+
+With INVOICE_TIMINGS=1 (or --timings on the command line) every load and every
+invoice records the wall time, the rows handled and the peak memory of each of
+its stages (workbook open and header scan, read, calculations, table, template,
+placeholders, document build, save, conversion...). Each run is then printed
+and appended as one JSON line to invoice-timings.jsonl next to the app;
+INVOICE_TIMINGS=<file> writes to another file.
+
+Peak memory comes from tracemalloc. It sees Python, NumPy and pandas
+allocations (not lxml's) and slows allocation-heavy code a little while
+timings are on. Stages that overlap on the loader thread and the Tk thread share
+their peak. max_rss_mb is the peak memory of the whole process.
+"""
+import json
+import os
+import sys
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+from threading import Lock
+from time import perf_counter
+from ingestion import last_load, resource_path
+
+TIMINGS_ENV = "INVOICE_TIMINGS"
+TIMINGS_FILE = "invoice-timings.jsonl"
+MB = 1024 * 1024
+
+
+def timings_enabled():
+    return os.environ.get(TIMINGS_ENV, "0") not in ("", "0")
+
+
+def timings_path():
+    value = os.environ.get(TIMINGS_ENV, "1")
+    return resource_path(TIMINGS_FILE) if value == "1" else value
+
+
+def max_rss_mb():
+    """Peak resident memory of the process so far in MB, None when unknown."""
+    try:
+        import resource
+    except ImportError:
+        return windows_peak_mb()
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return round(peak / (MB if sys.platform == "darwin" else 1024), 1)
+
+
+def windows_peak_mb():
+    try:
+        import ctypes
+        from ctypes import wintypes
+
+        class MemoryCounters(ctypes.Structure):
+            _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD)] + [
+                (name, ctypes.c_size_t) for name in (
+                    "PeakWorkingSetSize", "WorkingSetSize", "QuotaPeakPagedPoolUsage", "QuotaPagedPoolUsage",
+                    "QuotaPeakNonPagedPoolUsage", "QuotaNonPagedPoolUsage", "PagefileUsage", "PeakPagefileUsage",
+                )
+            ]
+
+        counters = MemoryCounters()
+        counters.cb = ctypes.sizeof(counters)
+        process = ctypes.windll.kernel32.GetCurrentProcess()
+        if not ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb):
+            return None
+        return round(counters.PeakWorkingSetSize / MB, 1)
+    except (AttributeError, OSError):
+        return None
+
+
+class Run:
+    """Stages of one load or invoice, written out by finish()."""
+
+    def __init__(self, kind, trace_memory=True, **fields):
+        self.record = {"run": kind, "started": datetime.now().isoformat(timespec="seconds"), **fields}
+        self.stages = {}
+        self.lock = Lock()
+        self.start = perf_counter()
+        self.finished = False
+
+        # Without memory tracing (benchmarks timing the stages) peak_mb is left out
+        self.trace_memory = trace_memory
+        self.traces_memory = trace_memory and not tracemalloc.is_tracing()
+        if self.traces_memory:
+            tracemalloc.start()
+
+    @contextmanager
+    def stage(self, name, rows=None):
+        """Times the block; a stage entered several times (per batch) adds up."""
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            peak = tracemalloc.get_traced_memory()[1] if self.trace_memory else None
+            self.add(name, perf_counter() - start, rows, peak)
+
+    def add(self, name, seconds, rows=None, peak_bytes=None):
+        with self.lock:
+            stage = self.stages.setdefault(name, {"seconds": 0.0})
+            stage["seconds"] += seconds
+            if rows is not None:
+                stage["rows"] = stage.get("rows", 0) + rows
+            if peak_bytes is not None:
+                stage["peak_mb"] = max(stage.get("peak_mb", 0.0), round(peak_bytes / MB, 1))
+
+    def add_load(self):
+        """Stages of the workbook read measured by ingestion (see last_load)."""
+        self.add("open and header scan", last_load["header_seconds"])
+        self.add("read", last_load["read_seconds"] - last_load["header_seconds"], rows=last_load["sheet_rows"])
+        self.record.update(backend=last_load["backend"])
+
+    def result(self, status="ok", **fields):
+        """The run as a dict, memory tracing stops here."""
+        stages = {name: dict(stage, seconds=round(stage["seconds"], 4)) for name, stage in self.stages.items()}
+        record = dict(self.record, **fields, status=status, seconds=round(perf_counter() - self.start, 4),
+                      stages=stages, max_rss_mb=max_rss_mb())
+        if self.traces_memory:
+            tracemalloc.stop()
+            self.traces_memory = False
+        return record
+
+    def finish(self, status="ok", **fields):
+        """Prints the run as a JSON line and appends it to the timings file (once)."""
+        if self.finished:
+            return
+        self.finished = True
+
+        record = self.result(status, **fields)
+        line = json.dumps(record, ensure_ascii=False, default=str)
+        print(line)
+        # Timings are only a diagnostic, a read-only install just prints them
+        try:
+            with open(timings_path(), "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+        except OSError:
+            pass
+        return record
+
+
+class NoTimings:
+    """Stands in for Run when timings are off, every call does nothing."""
+
+    def stage(self, name, rows=None):
+        return nullcontext()
+
+    def add(self, name, seconds, rows=None, peak_bytes=None):
+        pass
+
+    def add_load(self):
+        pass
+
+    def finish(self, status="ok", **fields):
+        pass
+
+
+NO_TIMINGS = NoTimings()
+
+
+def start_run(kind, **fields):
+    """Run recording the stages of a load or an invoice, or NO_TIMINGS when timings are off."""
+    return Run(kind, **fields) if timings_enabled() else NO_TIMINGS
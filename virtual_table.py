@@ -0,0 +1,99 @@
+"""Virtualized table for the bank windows.
+
+Inserting every row of a big month into a ttk.Treeview takes seconds and a lot of
+Tcl memory. VirtualTable keeps the rows in the row model and only materializes
+the rows that are on screen (plus a small buffer) as Treeview items, re-filling
+them whenever the view scrolls or is resized. Item ids are the row indices of
+the model, so identify_row()/bbox() keep working for inline editing.
+"""
+from tkinter import Frame, VERTICAL, CENTER
+from tkinter import ttk
+
+# Extra rows rendered below the visible ones, so a partly visible last row is drawn
+BUFFER_ROWS = 2
+DEFAULT_ROW_HEIGHT = 20
+
+
+class VirtualTable(Frame):
+    def __init__(self, master, columns, model, column_width=120):
+        super().__init__(master)
+        self.model = model
+        self.offset = 0
+        self.visible_rows = 1
+
+        self.tree = ttk.Treeview(self, columns=columns, show="headings", selectmode="browse")
+        for col in columns:
+            self.tree.heading(col, text=col)
+            self.tree.column(col, width=column_width, anchor=CENTER)
+        self.tree.pack(side="left", fill="both", expand=True)
+
+        self.scrollbar = ttk.Scrollbar(self, orient=VERTICAL, command=self.yview)
+        self.scrollbar.pack(side="right", fill="y")
+
+        self.tree.bind("<Configure>", self.on_resize)
+        self.tree.bind("<MouseWheel>", self.on_mouse_wheel)
+        self.tree.bind("<Button-4>", lambda event: self.scroll_rows(-3))
+        self.tree.bind("<Button-5>", lambda event: self.scroll_rows(3))
+        self.tree.bind("<Up>", lambda event: self.scroll_rows(-1))
+        self.tree.bind("<Down>", lambda event: self.scroll_rows(1))
+        self.tree.bind("<Prior>", lambda event: self.scroll_rows(-self.visible_rows))
+        self.tree.bind("<Next>", lambda event: self.scroll_rows(self.visible_rows))
+        self.tree.bind("<Home>", lambda event: self.scroll_to(0))
+        self.tree.bind("<End>", lambda event: self.scroll_to(len(self.model)))
+
+    def row_height(self):
+        try:
+            return int(ttk.Style().lookup("Treeview", "rowheight")) or DEFAULT_ROW_HEIGHT
+        except (ValueError, TypeError):
+            return DEFAULT_ROW_HEIGHT
+
+    def on_resize(self, event):
+        # The heading takes roughly one row
+        visible_rows = max(1, event.height // self.row_height() - 1)
+        if visible_rows != self.visible_rows:
+            self.visible_rows = visible_rows
+            self.refresh()
+
+    def on_mouse_wheel(self, event):
+        self.scroll_rows(-1 * (event.delta // 120 or (1 if event.delta > 0 else -1)) * 3)
+        return "break"
+
+    def max_offset(self):
+        return max(0, len(self.model) - self.visible_rows)
+
+    def scroll_to(self, offset):
+        offset = min(max(0, int(offset)), self.max_offset())
+        if offset != self.offset:
+            self.offset = offset
+            self.refresh()
+        return "break"
+
+    def scroll_rows(self, count):
+        return self.scroll_to(self.offset + count)
+
+    def yview(self, *args):
+        """Scrollbar command: ('moveto', fraction) or ('scroll', n, 'units'|'pages')."""
+        if args[0] == "moveto":
+            self.scroll_to(round(float(args[1]) * len(self.model)))
+        elif args[0] == "scroll":
+            step = self.visible_rows if args[2] == "pages" else 1
+            self.scroll_rows(int(args[1]) * step)
+
+    def refresh(self):
+        """Re-materializes the rows in view; cost depends on the window size, not the row count."""
+        total = len(self.model)
+        self.offset = min(self.offset, self.max_offset())
+
+        self.tree.delete(*self.tree.get_children())
+        for index in range(self.offset, min(total, self.offset + self.visible_rows + BUFFER_ROWS)):
+            self.tree.insert("", "end", iid=str(index), values=self.model.display_row(index))
+
+        if total:
+            self.scrollbar.set(self.offset / total, min(1.0, (self.offset + self.visible_rows) / total))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+    def refresh_row(self, index):
+        """Redraws one row after the model changed, if it is currently materialized."""
+        if self.tree.exists(str(index)):
+            self.tree.item(str(index), values=self.model.display_row(index))
@@ -0,0 +1,28 @@
+"""Private working directory of one invoice job.
+
+Every bank window used to save its document as 'filled.docx' in the current
+directory before converting it, so two invoices generated at the same time
+overwrote each other's file and the app needed write access to wherever it was
+started from. Each job now gets its own temporary directory, removed when done.
+"""
+from contextlib import contextmanager
+from os import path
+from shutil import rmtree
+from tempfile import mkdtemp
+
+DOCUMENT_NAME = "filled.docx"
+
+
+@contextmanager
+def job_workspace():
+    """Yields the path of a fresh temporary directory and removes it afterwards."""
+    workspace = mkdtemp(prefix="invoice-")
+    try:
+        yield workspace
+    finally:
+        # Word can still hold the file for a moment on Windows, a leftover temp dir is harmless
+        rmtree(workspace, ignore_errors=True)
+
+
+def document_path(workspace):
+    return path.join(workspace, DOCUMENT_NAME)